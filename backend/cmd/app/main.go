@@ -1,15 +1,19 @@
 package main
 
 import (
+    "cmp"
     "context"
     "encoding/json"
     "fmt"
+    "io"
     "log"
     "net/http"
     "os"
-    "sort"
+    "path/filepath"
+    "slices"
     "strconv"
     "strings"
+    "sync"
     "time"
     
     "github.com/joho/godotenv"
@@ -26,58 +30,135 @@ type analyzeRequest struct {
     MatchLimit int      `json:"matchLimit,omitempty"`
 }
 
+// playerSummary is the per-player analysis result listed in teamA/teamB.
+type playerSummary struct {
+    Name              string              `json:"name"`
+    SkillScore        int                 `json:"skill_score"`
+    CurrentRankScore  int                 `json:"current_rank_score"`
+    AvgMatchRankScore int                 `json:"avg_match_rank_score"`
+    MainLanes         []string            `json:"main_lanes"`
+    MainSublanes      []string            `json:"main_sublanes"`
+    MainChampions     []string            `json:"main_champions"`
+    MainLaneChampions map[string][]string `json:"main_lane_champions"`
+    SublaneChampions  map[string][]string `json:"sublane_champions"`
+    MasteryTop3       int                 `json:"mastery_top3"`
+    RankedRecentCount int                 `json:"ranked_recent_count"`
+    RankedRecentWins  int                 `json:"ranked_recent_wins"`
+}
+
+// laneSeat is one player of the lane-unique split with the lane assigned to them.
+type laneSeat struct {
+    Name  string `json:"name"`
+    Role  string `json:"role"`
+    Skill int    `json:"skill"`
+}
+
+type laneUniqueResult struct {
+    TeamA []laneSeat `json:"teamA"`
+    TeamB []laneSeat `json:"teamB"`
+    SumA  int        `json:"sumA"`
+    SumB  int        `json:"sumB"`
+}
+
+type analyzeMeta struct {
+    DurationMS int64 `json:"duration_ms"`
+    Players    int   `json:"players"`
+    MatchLimit int   `json:"match_limit"`
+}
+
+// analyzeResult is the /analyze response body; lane_unique is only set for 10 players, meta only in the HTTP response.
+type analyzeResult struct {
+    TeamA      []playerSummary   `json:"teamA"`
+    TeamB      []playerSummary   `json:"teamB"`
+    SumA       int               `json:"sumA"`
+    SumB       int               `json:"sumB"`
+    LaneUnique *laneUniqueResult `json:"lane_unique,omitempty"`
+    Meta       *analyzeMeta      `json:"meta,omitempty"`
+}
+
 // Tier/Rank maps
 var tierToInt = map[string]int{
     "IRON": 1, "BRONZE": 2, "SILVER": 3, "GOLD": 4, "PLATINUM": 5,
     "EMERALD": 6, "DIAMOND": 7, "MASTER": 8, "GRANDMASTER": 9, "CHALLENGER": 10,
 }
-var intToTier = map[int]string{1: "IRON", 2: "BRONZE", 3: "SILVER", 4: "GOLD", 5: "PLATINUM", 6: "EMERALD", 7: "DIAMOND", 8: "MASTER", 9: "GRANDMASTER", 10: "CHALLENGER"}
+var intToTier = [...]string{1: "IRON", 2: "BRONZE", 3: "SILVER", 4: "GOLD", 5: "PLATINUM", 6: "EMERALD", 7: "DIAMOND", 8: "MASTER", 9: "GRANDMASTER", 10: "CHALLENGER"}
 var rankToInt = map[string]int{"IV": 1, "III": 2, "II": 3, "I": 4}
-var intToRank = map[int]string{1: "IV", 2: "III", 3: "II", 4: "I"}
-
-func rankScore(tier, rank string, lp int) int {
-    t := tierToInt[tier]
-    r := rankToInt[rank]
-    return ((t-1)*4+(r-1))*100 + lp
+var intToRank = [...]string{1: "IV", 2: "III", 3: "II", 4: "I"} // reverse lookups are arrays indexed by number (0 unused)
+
+// rankScore maps tier/rank/LP to a single score; ok is false for an unknown tier or division.
+func rankScore(tier, rank string, lp int) (score int, ok bool) {
+    t, okT := tierToInt[tier]
+    r, okR := rankToInt[rank]
+    if !okT || !okR { return 0, false }
+    return ((t-1)*4+(r-1))*100 + lp, true
 }
 func scoreToRank(score int) (string, string, int) {
     tierIdx := score/400 + 1
     rankIdx := (score%400)/100 + 1
     lp := score % 100
+    if tierIdx < 1 || tierIdx >= len(intToTier) || rankIdx < 1 || rankIdx >= len(intToRank) { return "", "", lp }
     return intToTier[tierIdx], intToRank[rankIdx], lp
 }
 
+// lanes lists Riot's teamPosition values; lane counts are arrays indexed by laneIndex, ending with UNKNOWN.
+var lanes = [...]string{"TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY", "UNKNOWN"}
+
+func laneIndex(pos string) int {
+    for i, l := range lanes[:len(lanes)-1] { if l == pos { return i } }
+    return len(lanes) - 1
+}
+
+// sendLog is a fixed-size ring of send times for one rate window, stored as offsets from the limiter's start
+// (8 bytes each and pointer-free, instead of growing a []time.Time).
+type sendLog struct {
+    at   []time.Duration
+    head int // oldest entry
+    n    int
+}
+func (l *sendLog) full() bool { return l.n == len(l.at) }
+func (l *sendLog) oldest() time.Duration { return l.at[l.head] }
+func (l *sendLog) push(t time.Duration) { l.at[(l.head+l.n)%len(l.at)] = t; l.n++ }
+func (l *sendLog) prune(cutoff time.Duration) {
+    for l.n > 0 && l.at[l.head] < cutoff {
+        l.head = (l.head + 1) % len(l.at)
+        l.n--
+    }
+}
+
 // Basic rate limiter matching CLI behavior
 type RiotLimiter struct {
-    secWin []time.Time
-    twoMin []time.Time
+    mu     sync.Mutex
+    start  time.Time
+    secWin sendLog // 20 req / 1s
+    twoMin sendLog // 100 req / 120s
 }
-func (r *RiotLimiter) Wait() {
+func newRiotLimiter() *RiotLimiter {
+    return &RiotLimiter{start: time.Now(), secWin: sendLog{at: make([]time.Duration, 20)}, twoMin: sendLog{at: make([]time.Duration, 100)}}
+}
+// Wait blocks until a request may be sent and records it; it returns ctx.Err() without taking a slot if ctx ends first.
+func (r *RiotLimiter) Wait(ctx context.Context) error {
     for {
-        now := time.Now()
-        cutoff1 := now.Add(-1 * time.Second)
-        for len(r.secWin) > 0 && r.secWin[0].Before(cutoff1) {
-            r.secWin = r.secWin[1:]
-        }
-        cutoff2 := now.Add(-120 * time.Second)
-        for len(r.twoMin) > 0 && r.twoMin[0].Before(cutoff2) {
-            r.twoMin = r.twoMin[1:]
-        }
-        if len(r.secWin) < 20 && len(r.twoMin) < 100 {
-            r.secWin = append(r.secWin, now)
-            r.twoMin = append(r.twoMin, now)
-            return
+        if err := ctx.Err(); err != nil { return err }
+        r.mu.Lock()
+        now := time.Since(r.start)
+        r.secWin.prune(now - 1*time.Second)
+        r.twoMin.prune(now - 120*time.Second)
+        if !r.secWin.full() && !r.twoMin.full() {
+            r.secWin.push(now)
+            r.twoMin.push(now)
+            r.mu.Unlock()
+            return nil
         }
         wait1 := time.Duration(0)
-        if len(r.secWin) >= 20 {
-            w := r.secWin[0].Add(1 * time.Second).Sub(now)
+        if r.secWin.full() {
+            w := r.secWin.oldest() + 1*time.Second - now
             if w > wait1 {
                 wait1 = w
             }
         }
         wait2 := time.Duration(0)
-        if len(r.twoMin) >= 100 {
-            w := r.twoMin[0].Add(120 * time.Second).Sub(now)
+        if r.twoMin.full() {
+            w := r.twoMin.oldest() + 120*time.Second - now
             if w > wait2 {
                 wait2 = w
             }
@@ -89,17 +170,33 @@ func (r *RiotLimiter) Wait() {
         if sleepFor < 10*time.Millisecond {
             sleepFor = 10 * time.Millisecond
         }
-        time.Sleep(sleepFor)
+        r.mu.Unlock()
+        if err := sleepCtx(ctx, sleepFor); err != nil { return err }
     }
 }
 
+// sleepCtx sleeps for d, returning ctx.Err() early if ctx ends first.
+func sleepCtx(ctx context.Context, d time.Duration) error {
+    t := time.NewTimer(d)
+    defer t.Stop()
+    select {
+    case <-t.C: return nil
+    case <-ctx.Done(): return ctx.Err()
+    }
+}
+
+// skipOnLimit mirrors SKIP=true; set once in main after .env is loaded.
+var skipOnLimit bool
+
 func doRequestWithRetry(req *http.Request, client *http.Client, limiter *RiotLimiter, maxRetry int) (*http.Response, error) {
-    skipOnLimit := os.Getenv("SKIP") == "true"
     backoff := 1 * time.Second
     tries := 0
     var lastStatus int
+    // a cancelled analyze (another player failed, or the client went away) must not keep spending rate budget,
+    // so every wait below gives up as soon as the request's context ends
+    ctx := req.Context()
     for {
-        limiter.Wait()
+        if err := limiter.Wait(ctx); err != nil { return nil, err }
         tries++
         resp, err := client.Do(req)
         if err == nil && resp != nil && resp.StatusCode == 200 {
@@ -125,7 +222,7 @@ func doRequestWithRetry(req *http.Request, client *http.Client, limiter *RiotLim
                 if skipOnLimit {
                     return nil, nil
                 }
-                time.Sleep(wait)
+                if err := sleepCtx(ctx, wait); err != nil { return nil, err }
                 continue
             }
             if resp.StatusCode >= 500 && resp.StatusCode < 600 {
@@ -136,7 +233,7 @@ func doRequestWithRetry(req *http.Request, client *http.Client, limiter *RiotLim
                 if maxRetry > 0 && tries >= maxRetry {
                     break
                 }
-                time.Sleep(backoff)
+                if err := sleepCtx(ctx, backoff); err != nil { return nil, err }
                 if backoff < 30*time.Second {
                     backoff *= 2
                 }
@@ -150,7 +247,7 @@ func doRequestWithRetry(req *http.Request, client *http.Client, limiter *RiotLim
         if maxRetry > 0 && tries >= maxRetry {
             break
         }
-        time.Sleep(backoff)
+        if err := sleepCtx(ctx, backoff); err != nil { return nil, err }
         if backoff < 30*time.Second {
             backoff *= 2
         }
@@ -158,313 +255,607 @@ func doRequestWithRetry(req *http.Request, client *http.Client, limiter *RiotLim
     return nil, fmt.Errorf("request failed after retries, status=%d", lastStatus)
 }
 
-func analyze(ctx context.Context, apiKey string, players []Player, matchLimit int) (map[string]interface{}, error) {
-    if len(players) < 2 {
-        return nil, fmt.Errorf("need at least 2 players")
+// maxInflight bounds concurrent Riot API calls per analyze run (RiotLimiter still enforces the Riot rate limits).
+const maxInflight = 10
+
+type rankEntry struct{ QueueType, Tier, Rank string; LeaguePoints int }
+
+// matchDetail holds the only match-v5 fields analyze reads; the response cache also stores match bodies in this shape.
+type matchDetail struct { Info struct { QueueID int `json:"queueId"`; Participants []struct{ PUUID string `json:"puuid"`; ChampionID int `json:"championId"`; TeamPosition string `json:"teamPosition"`; Win bool `json:"win"` } `json:"participants"` } `json:"info"` }
+type masteryEntry struct{ ChampionID, ChampionLevel, ChampionPoints int }
+
+// riotClient bundles what every Riot API call needs and caps the number of in-flight requests.
+type riotClient struct {
+    apiKey  string
+    client  *http.Client
+    limiter *RiotLimiter
+    sem     chan struct{}
+}
+
+// riotHTTP is shared by every Riot API / Data Dragon call so keep-alive connections (HTTP/2 when the server
+// offers it) are reused across /analyze requests. The default transport keeps only 2 idle connections per host,
+// fewer than maxInflight, which would reopen TLS connections during a fan-out.
+var riotHTTP = &http.Client{Timeout: 10 * time.Second, Transport: newRiotTransport()}
+
+func newRiotTransport() *http.Transport {
+    t := http.DefaultTransport.(*http.Transport).Clone() // keeps proxy, dial timeouts and ForceAttemptHTTP2
+    t.MaxIdleConnsPerHost = 2 * maxInflight
+    return t
+}
+
+// riotLimiter is shared the same way: Riot's rate limits are per API key, so concurrent /analyze requests must draw
+// from one budget instead of each getting its own 20/s and 100/2min windows.
+var riotLimiter = newRiotLimiter()
+
+func newRiotClient(apiKey string) *riotClient {
+    return &riotClient{apiKey: apiKey, client: riotHTTP, limiter: riotLimiter, sem: make(chan struct{}, maxInflight)}
+}
+
+// ---- Riot API response cache (process-wide, shared by all /analyze calls) ----
+const maxCacheEntries = 5000
+
+type cacheEntry struct {
+    body    []byte
+    expires time.Time // zero: never expires
+}
+
+type responseCache struct {
+    mu      sync.Mutex
+    entries map[string]cacheEntry
+}
+
+var riotCache = &responseCache{entries: map[string]cacheEntry{}}
+
+// cacheTTL returns how long a response for url stays fresh (0 = forever) and whether it is cached at all.
+// Match details are immutable once the match has ended; rank and mastery move slowly.
+func cacheTTL(url string) (time.Duration, bool) {
+    switch {
+    case strings.Contains(url, "/lol/match/v5/matches/by-puuid/"):
+        return 60 * time.Second, true
+    case strings.Contains(url, "/lol/match/v5/matches/"):
+        return 0, true
+    case strings.Contains(url, "/lol/league/"):
+        return 60 * time.Second, true
+    case strings.Contains(url, "/lol/champion-mastery/"), strings.Contains(url, "/riot/account/"):
+        return time.Hour, true
     }
-    client := &http.Client{}
-    limiter := &RiotLimiter{}
+    return 0, false
+}
 
-    // champion id -> name map
-    championIDToName := map[int]string{}
-    {
-        req, _ := http.NewRequestWithContext(ctx, "GET", "https://ddragon.leagueoflegends.com/cdn/15.14.1/data/ja_JP/champion.json", nil)
-        resp, err := client.Do(req)
-        if err == nil && resp != nil && resp.StatusCode == 200 {
-            defer resp.Body.Close()
-            var champData struct {
-                Data map[string]struct {
-                    Key  string `json:"key"`
-                    Name string `json:"name"`
-                } `json:"data"`
-            }
-            if err := json.NewDecoder(resp.Body).Decode(&champData); err == nil {
-                for _, v := range champData.Data {
-                    var id int
-                    fmt.Sscanf(v.Key, "%d", &id)
-                    championIDToName[id] = v.Name
-                }
-            }
-        }
+// compactBody re-encodes a match detail body as matchDetail, dropping the rest of the raw match-v5 payload
+// (tens of KB to ~100KB each, against ~1KB kept). Match details never expire, so storing them raw would let
+// maxCacheEntries of them grow to hundreds of MB. Other bodies are small and returned as is.
+// Only the in-memory copy is compacted; matchCacheDir keeps the raw body.
+func compactBody(url string, body []byte) []byte {
+    if ttl, ok := cacheTTL(url); !ok || ttl != 0 { return body }
+    var d matchDetail
+    if err := json.Unmarshal(body, &d); err != nil { return body }
+    if b, err := json.Marshal(&d); err == nil { return b }
+    return body
+}
+
+// get returns the cached body for key and whether it is still fresh.
+func (c *responseCache) get(key string) (body []byte, fresh bool, ok bool) {
+    c.mu.Lock()
+    defer c.mu.Unlock()
+    e, ok := c.entries[key]
+    if !ok { return nil, false, false }
+    return e.body, e.expires.IsZero() || time.Now().Before(e.expires), true
+}
+
+func (c *responseCache) set(key string, body []byte, ttl time.Duration) {
+    c.mu.Lock()
+    defer c.mu.Unlock()
+    if _, ok := c.entries[key]; !ok && len(c.entries) >= maxCacheEntries {
+        // drop expired entries first, then anything, to stay bounded
+        now := time.Now()
+        for k, e := range c.entries { if !e.expires.IsZero() && now.After(e.expires) { delete(c.entries, k) } }
+        for k := range c.entries { if len(c.entries) < maxCacheEntries { break }; delete(c.entries, k) }
     }
+    e := cacheEntry{body: body}
+    if ttl > 0 { e.expires = time.Now().Add(ttl) }
+    c.entries[key] = e
+}
 
-    allPlayerData := make([]map[string]interface{}, 0, len(players))
+// matchCacheDir mirrors CACHE_DIR (empty: disabled); set once in main. Match details never change, so they are also
+// kept there as <matchID>.json: a restarted server, or several servers sharing the directory, start warm instead of
+// refetching them, and the OS page cache shares the files between processes. Files hold the raw Riot response, not
+// the compactBody form, so they stay valid when matchDetail starts decoding more fields.
+var matchCacheDir string
+
+// matchCacheFile returns the on-disk path for a match detail url, or "" when url is not one or the disk cache is off.
+func matchCacheFile(url string) string {
+    if matchCacheDir == "" || strings.Contains(url, "/matches/by-puuid/") { return "" }
+    i := strings.LastIndex(url, "/lol/match/v5/matches/")
+    if i < 0 { return "" }
+    id := url[i+len("/lol/match/v5/matches/"):]
+    if id == "" || strings.ContainsAny(id, `/\?.`) { return "" }
+    return filepath.Join(matchCacheDir, id+".json")
+}
 
-    for _, player := range players {
-        // 1) account by riot-id
-        url := fmt.Sprintf("https://asia.api.riotgames.com/riot/account/v1/accounts/by-riot-id/%s/%s", player.GameName, player.TagLine)
-        req, _ := http.NewRequestWithContext(ctx, "GET", url, nil)
-        req.Header.Set("X-Riot-Token", apiKey)
-        resp, err := doRequestWithRetry(req, client, limiter, 3)
-        if err != nil || resp == nil || (resp.StatusCode != 200 && resp.StatusCode != 404) {
-            if resp != nil { resp.Body.Close() }
-            return nil, fmt.Errorf("account lookup failed for %s#%s", player.GameName, player.TagLine)
-        }
-        var account struct{
-            PUUID    string `json:"puuid"`
-            GameName string `json:"gameName"`
-            TagLine  string `json:"tagLine"`
-        }
-        if resp.StatusCode == 200 {
-            if err := json.NewDecoder(resp.Body).Decode(&account); err != nil { resp.Body.Close(); return nil, err }
-            resp.Body.Close()
-        } else {
-            // 404: skip
-            resp.Body.Close()
-            continue
-        }
+// writeMatchCacheFile stores body via a temp file + rename so concurrent readers never see a partial file.
+// CreateTemp makes 0600 files, so they are opened up to 0644 for servers running as other users.
+func writeMatchCacheFile(path string, body []byte) {
+    tmp, err := os.CreateTemp(matchCacheDir, ".match-*")
+    if err != nil { log.Printf("match cache: %v", err); return }
+    _, werr := tmp.Write(body)
+    if werr == nil { werr = tmp.Chmod(0644) }
+    cerr := tmp.Close()
+    if werr == nil && cerr == nil { werr = os.Rename(tmp.Name(), path) }
+    if werr != nil || cerr != nil {
+        os.Remove(tmp.Name())
+        log.Printf("match cache: failed to write %s: %v %v", path, werr, cerr)
+    }
+}
 
-        // 2) match list by puuid
-        matchListUrl := fmt.Sprintf("https://asia.api.riotgames.com/lol/match/v5/matches/by-puuid/%s/ids?start=0&count=100", account.PUUID)
-        mreq, _ := http.NewRequestWithContext(ctx, "GET", matchListUrl, nil)
-        mreq.Header.Set("X-Riot-Token", apiKey)
-        mresp, err := doRequestWithRetry(mreq, client, limiter, 3)
-        if err != nil || mresp == nil || mresp.StatusCode != 200 {
-            if mresp != nil { mresp.Body.Close() }
-            return nil, fmt.Errorf("failed to get matches for %s", account.PUUID)
+// matchCacheMaxAge bounds the disk cache: older files (and leftover temp files) are removed by pruneMatchCache.
+// Only the most recent matches of a player are analyzed, so old details are rarely read again.
+const matchCacheMaxAge = 30 * 24 * time.Hour
+
+// pruneMatchCache removes cache files not written within matchCacheMaxAge.
+func pruneMatchCache() {
+    entries, err := os.ReadDir(matchCacheDir)
+    if err != nil { log.Printf("match cache: %v", err); return }
+    cutoff := time.Now().Add(-matchCacheMaxAge)
+    removed := 0
+    for _, e := range entries {
+        if e.IsDir() { continue }
+        info, err := e.Info()
+        if err != nil || info.ModTime().After(cutoff) { continue }
+        if os.Remove(filepath.Join(matchCacheDir, e.Name())) == nil { removed++ }
+    }
+    if removed > 0 { log.Printf("match cache: pruned %d files older than %s", removed, matchCacheMaxAge) }
+}
+
+// getJSON GETs url with retry and decodes a 200 body into v.
+// Cacheable endpoints are served from riotCache while fresh; a stale entry is used if the request fails
+// or is skipped (doRequestWithRetry only returns a response for 200/404; 5xx/429 end as an error or a SKIP).
+// Match details missing from memory are looked up in matchCacheDir before going to the network.
+// It returns the final status code (0 when the request was skipped under SKIP=true).
+func (rc *riotClient) getJSON(ctx context.Context, url string, v interface{}) (int, error) {
+    ttl, cacheable := cacheTTL(url)
+    var stale []byte
+    if cacheable {
+        if body, fresh, ok := riotCache.get(url); ok {
+            if fresh { return 200, json.Unmarshal(body, v) }
+            stale = body
         }
-        var matchIDs []string
-        if err := json.NewDecoder(mresp.Body).Decode(&matchIDs); err != nil { mresp.Body.Close(); return nil, err }
-        mresp.Body.Close()
-        if matchLimit <= 0 || matchLimit > len(matchIDs) { matchLimit = len(matchIDs) }
-
-        championCount := map[int]int{}
-        laneCount := map[string]int{}
-        laneChampCount := make(map[string]map[int]int) // lane -> champId -> count
-        rankedCount := 0
-        rankedWin := 0
-        puuidSet := make(map[string]struct{})
-
-        // 3) details pass 1: count champs and lanes, track ranked matches
-        for i := 0; i < matchLimit; i++ {
-            mid := matchIDs[i]
-            durl := fmt.Sprintf("https://asia.api.riotgames.com/lol/match/v5/matches/%s", mid)
-            dreq, _ := http.NewRequestWithContext(ctx, "GET", durl, nil)
-            dreq.Header.Set("X-Riot-Token", apiKey)
-            dresp, err := doRequestWithRetry(dreq, client, limiter, 3)
-            if err != nil || dresp == nil || dresp.StatusCode != 200 { if dresp != nil { dresp.Body.Close() }; continue }
-            var detail struct { Info struct { QueueID int `json:"queueId"`; Participants []struct{ PUUID string `json:"puuid"`; ChampionID int `json:"championId"`; TeamPosition string `json:"teamPosition"`; Win bool `json:"win"` } `json:"participants"` } `json:"info"` }
-            if err := json.NewDecoder(dresp.Body).Decode(&detail); err != nil { dresp.Body.Close(); continue }
-            dresp.Body.Close()
-            if detail.Info.QueueID == 1700 || detail.Info.QueueID == 490 || detail.Info.QueueID == 450 { continue }
-            if detail.Info.QueueID != 400 && detail.Info.QueueID != 430 && detail.Info.QueueID != 420 { continue }
-            for _, p := range detail.Info.Participants {
-                puuidSet[p.PUUID] = struct{}{}
-                if p.PUUID == account.PUUID {
-                    championCount[p.ChampionID]++
-                    lane := p.TeamPosition
-                    if lane == "" { lane = "UNKNOWN" }
-                    laneCount[lane]++
-                    if laneChampCount[lane] == nil { laneChampCount[lane] = make(map[int]int) }
-                    laneChampCount[lane][p.ChampionID]++
-                    if detail.Info.QueueID == 420 { rankedCount++; if p.Win { rankedWin++ } }
-                }
+    }
+    diskPath := matchCacheFile(url)
+    if diskPath != "" && stale == nil {
+        if body, err := os.ReadFile(diskPath); err == nil {
+            if err := json.Unmarshal(body, v); err == nil {
+                riotCache.set(url, compactBody(url, body), ttl)
+                return 200, nil
             }
         }
+    }
+    if err := ctx.Err(); err != nil { return 0, err }
+    select {
+    case rc.sem <- struct{}{}:
+    case <-ctx.Done(): return 0, ctx.Err()
+    }
+    defer func() { <-rc.sem }()
+    req, err := http.NewRequestWithContext(ctx, "GET", url, nil)
+    if err != nil { return 0, err }
+    req.Header.Set("X-Riot-Token", rc.apiKey)
+    resp, err := doRequestWithRetry(req, rc.client, rc.limiter, 3)
+    if err != nil || resp == nil {
+        if stale != nil { return 200, json.Unmarshal(stale, v) }
+        return 0, err
+    }
+    defer resp.Body.Close()
+    if resp.StatusCode != 200 { return resp.StatusCode, nil }
+    body, err := io.ReadAll(resp.Body)
+    if err != nil { return resp.StatusCode, err }
+    if err := json.Unmarshal(body, v); err != nil { return resp.StatusCode, err }
+    if diskPath != "" { writeMatchCacheFile(diskPath, body) } // raw body: matchDetail may gain fields later
+    if cacheable { riotCache.set(url, compactBody(url, body), ttl) }
+    return resp.StatusCode, nil
+}
 
-        // rank by puuid (current)
-        rankUrl := fmt.Sprintf("https://jp1.api.riotgames.com/lol/league/v4/entries/by-puuid/%s", account.PUUID)
-        rreq, _ := http.NewRequestWithContext(ctx, "GET", rankUrl, nil)
-        rreq.Header.Set("X-Riot-Token", apiKey)
-        rresp, err := doRequestWithRetry(rreq, client, limiter, 3)
-        var currentRankScore int
-        if err == nil && rresp != nil && rresp.StatusCode == 200 {
-            var ranks []struct{ QueueType, Tier, Rank string; LeaguePoints int }
-            if err := json.NewDecoder(rresp.Body).Decode(&ranks); err == nil {
-                for _, e := range ranks { if e.QueueType == "RANKED_SOLO_5x5" { currentRankScore = rankScore(e.Tier, e.Rank, e.LeaguePoints); break } }
+// maxBalanceCells caps the (team size x skill sum) table used by balanceTeams.
+const maxBalanceCells = 1 << 22
+
+// balanceTeams picks teamA (size (n+1)/2) minimizing |sum(teamA) - sum(teamB)| and reports membership per index.
+// Subset-sum DP over (team size, skill sum) instead of enumerating every combination. Skills are shifted so the
+// minimum is 0 (team sizes are fixed, so only a constant offset changes) and scaled down if the table would be too large.
+func balanceTeams(skills []int) []bool {
+    n := len(skills)
+    half := (n + 1) / 2
+    minSkill := 0
+    for i, s := range skills { if i == 0 || s < minSkill { minSkill = s } }
+    total := 0
+    for _, s := range skills { total += s - minSkill }
+    scale := 1
+    if maxSum := maxBalanceCells/(half+1) - 1; total > maxSum { scale = (total + maxSum - 1) / maxSum }
+    w := make([]int, n)
+    total = 0
+    for i, s := range skills { w[i] = (s - minSkill + scale/2) / scale; total += w[i] }
+
+    // last[k*width+s] = 1 + index of the player that first reached team size k with sum s; 0 = unreachable
+    width := total + 1
+    last := make([]int16, (half+1)*width)
+    last[0] = -1
+    for i := 0; i < n; i++ {
+        for k := min(i+1, half); k >= 1; k-- {
+            row, prev := last[k*width:(k+1)*width], last[(k-1)*width:k*width]
+            for s := total; s >= w[i]; s-- {
+                if row[s] == 0 && prev[s-w[i]] != 0 { row[s] = int16(i + 1) }
             }
-            rresp.Body.Close()
-        } else if rresp != nil { rresp.Body.Close() }
+        }
+    }
+    best, bestDiff := 0, -1
+    for s := 0; s <= total; s++ {
+        if last[half*width+s] == 0 { continue }
+        d := (2*s-total)*scale + (2*half-n)*minSkill // back in unshifted units (teams differ in size when n is odd)
+        if d < 0 { d = -d }
+        if bestDiff < 0 || d < bestDiff { best, bestDiff = s, d }
+    }
+    inA := make([]bool, n)
+    for k, s := half, best; k > 0; k-- {
+        i := int(last[k*width+s]) - 1
+        inA[i] = true
+        s -= w[i]
+    }
+    return inA
+}
+
+// nextComb returns the next larger integer with the same number of set bits (Gosper's hack).
+func nextComb(x int) int {
+    c := x & -x
+    r := x + c
+    return (((r ^ x) >> 2) / c) | r
+}
+
+// Data Dragon champion id -> name map. The Data Dragon version is pinned, so it is downloaded and decoded once
+// per process instead of on every /analyze call. One caller fetches outside the lock while the others wait on
+// loading; a failed fetch is remembered for champNamesRetry so a slow or down Data Dragon is not hit per request.
+var champNames struct {
+    mu      sync.Mutex
+    m       map[int]string
+    loading chan struct{} // non-nil while a fetch is in flight; closed when it ends
+    retryAt time.Time     // after a failure, callers get an empty map until then
+}
+
+const champNamesRetry = 30 * time.Second
+
+func championNames(ctx context.Context, client *http.Client) map[int]string {
+    champNames.mu.Lock()
+    for champNames.m == nil && champNames.loading != nil {
+        ch := champNames.loading
+        champNames.mu.Unlock()
+        select {
+        case <-ch:
+        case <-ctx.Done(): return map[int]string{}
+        }
+        champNames.mu.Lock()
+    }
+    if champNames.m != nil || time.Now().Before(champNames.retryAt) {
+        m := champNames.m
+        champNames.mu.Unlock()
+        if m == nil { return map[int]string{} }
+        return m
+    }
+    ch := make(chan struct{})
+    champNames.loading = ch
+    champNames.mu.Unlock()
+
+    // not tied to this request: waiters rely on the result, and the client timeout still bounds it
+    m := fetchChampionNames(context.WithoutCancel(ctx), client)
+
+    champNames.mu.Lock()
+    if m != nil { champNames.m = m } else { champNames.retryAt = time.Now().Add(champNamesRetry) }
+    champNames.loading = nil
+    close(ch)
+    champNames.mu.Unlock()
+    if m == nil { return map[int]string{} }
+    return m
+}
+
+// fetchChampionNames downloads the Data Dragon champion list; nil on any failure.
+func fetchChampionNames(ctx context.Context, client *http.Client) map[int]string {
+    req, _ := http.NewRequestWithContext(ctx, "GET", "https://ddragon.leagueoflegends.com/cdn/15.14.1/data/ja_JP/champion.json", nil)
+    resp, err := client.Do(req)
+    if err != nil || resp == nil { return nil }
+    defer resp.Body.Close()
+    var champData struct {
+        Data map[string]struct {
+            Key  string `json:"key"`
+            Name string `json:"name"`
+        } `json:"data"`
+    }
+    if resp.StatusCode != 200 || json.NewDecoder(resp.Body).Decode(&champData) != nil { return nil }
+    m := make(map[int]string, len(champData.Data))
+    for _, v := range champData.Data {
+        id, _ := strconv.Atoi(v.Key)
+        m[id] = v.Name
+    }
+    return m
+}
+
+// statusErr is the cause of a failed getJSON: its error, or the unexpected status when the call itself succeeded.
+func statusErr(status int, err error) error {
+    if err != nil { return err }
+    return fmt.Errorf("status %d", status)
+}
 
-        // mastery by puuid (top3 sum)
+// analyzePlayer fetches and scores one player; it returns nil without an error when the Riot ID does not exist.
+// matchLimit is capped to the player's match count locally, so concurrent calls never share it.
+func (rc *riotClient) analyzePlayer(ctx context.Context, player Player, matchLimit int, championIDToName map[int]string) (*playerSummary, error) {
+    // 1) account by riot-id
+    url := fmt.Sprintf("https://asia.api.riotgames.com/riot/account/v1/accounts/by-riot-id/%s/%s", player.GameName, player.TagLine)
+    var account struct{
+        PUUID    string `json:"puuid"`
+        GameName string `json:"gameName"`
+        TagLine  string `json:"tagLine"`
+    }
+    status, err := rc.getJSON(ctx, url, &account)
+    if err != nil || (status != 200 && status != 404) {
+        return nil, fmt.Errorf("account lookup failed for %s#%s: %w", player.GameName, player.TagLine, statusErr(status, err))
+    }
+    if status == 404 { return nil, nil } // 404: skip
+
+    // 2) match list by puuid
+    matchListUrl := fmt.Sprintf("https://asia.api.riotgames.com/lol/match/v5/matches/by-puuid/%s/ids?start=0&count=100", account.PUUID)
+    var matchIDs []string
+    if status, err := rc.getJSON(ctx, matchListUrl, &matchIDs); err != nil || status != 200 {
+        return nil, fmt.Errorf("failed to get matches for %s: %w", account.PUUID, statusErr(status, err))
+    }
+    if matchLimit <= 0 || matchLimit > len(matchIDs) { matchLimit = len(matchIDs) }
+
+    // 3) match details, current rank and mastery only depend on the puuid: fetch them concurrently
+    details := make([]*matchDetail, matchLimit)
+    var ranks []rankEntry
+    var masteries []masteryEntry
+    var rankOK, masteryOK bool
+    var wg sync.WaitGroup
+    for i := 0; i < matchLimit; i++ {
+        wg.Add(1)
+        go func(i int) {
+            defer wg.Done()
+            var d matchDetail
+            durl := fmt.Sprintf("https://asia.api.riotgames.com/lol/match/v5/matches/%s", matchIDs[i])
+            if status, err := rc.getJSON(ctx, durl, &d); err == nil && status == 200 { details[i] = &d }
+        }(i)
+    }
+    wg.Add(2)
+    go func() {
+        defer wg.Done()
+        rankUrl := fmt.Sprintf("https://jp1.api.riotgames.com/lol/league/v4/entries/by-puuid/%s", account.PUUID)
+        status, err := rc.getJSON(ctx, rankUrl, &ranks)
+        rankOK = err == nil && status == 200
+    }()
+    go func() {
+        defer wg.Done()
         masteryUrl := fmt.Sprintf("https://jp1.api.riotgames.com/lol/champion-mastery/v4/champion-masteries/by-puuid/%s", account.PUUID)
-        m2req, _ := http.NewRequestWithContext(ctx, "GET", masteryUrl, nil)
-        m2req.Header.Set("X-Riot-Token", apiKey)
-        m2resp, err := doRequestWithRetry(m2req, client, limiter, 3)
-        topMastery := 0
-        var masteries []struct{ ChampionID, ChampionLevel, ChampionPoints int }
-        if err == nil && m2resp != nil && m2resp.StatusCode == 200 {
-            if err := json.NewDecoder(m2resp.Body).Decode(&masteries); err == nil {
-                sort.Slice(masteries, func(i, j int) bool { return masteries[i].ChampionPoints > masteries[j].ChampionPoints })
-                for i := 0; i < 3 && i < len(masteries); i++ { topMastery += masteries[i].ChampionPoints }
+        status, err := rc.getJSON(ctx, masteryUrl, &masteries)
+        masteryOK = err == nil && status == 200
+    }()
+    wg.Wait()
+
+    championCount := map[int]int{}
+    var laneCount [len(lanes)]int
+    laneChampCount := make(map[string]map[int]int) // lane -> champId -> count
+    rankedCount := 0
+    rankedWin := 0
+    puuidSet := make(map[string]struct{})
+
+    // details pass 1: count champs and lanes, track ranked matches
+    for _, detail := range details {
+        if detail == nil { continue }
+        if detail.Info.QueueID == 1700 || detail.Info.QueueID == 490 || detail.Info.QueueID == 450 { continue }
+        if detail.Info.QueueID != 400 && detail.Info.QueueID != 430 && detail.Info.QueueID != 420 { continue }
+        for _, p := range detail.Info.Participants {
+            puuidSet[p.PUUID] = struct{}{}
+            if p.PUUID == account.PUUID {
+                championCount[p.ChampionID]++
+                li := laneIndex(p.TeamPosition)
+                lane := lanes[li]
+                laneCount[li]++
+                if laneChampCount[lane] == nil { laneChampCount[lane] = make(map[int]int) }
+                laneChampCount[lane][p.ChampionID]++
+                if detail.Info.QueueID == 420 { rankedCount++; if p.Win { rankedWin++ } }
             }
-            m2resp.Body.Close()
-        } else if m2resp != nil { m2resp.Body.Close() }
-
-        // lanes
-        var laneStats []struct{ Lane string; Count int }
-        for k, v := range laneCount { laneStats = append(laneStats, struct{ Lane string; Count int }{k, v}) }
-        sort.Slice(laneStats, func(i, j int) bool { return laneStats[i].Count > laneStats[j].Count })
-        mainLanes := []string{}
-        subLanes := []string{}
-        for i := 0; i < 2 && i < len(laneStats); i++ { mainLanes = append(mainLanes, laneStats[i].Lane) }
-        for i := 2; i < 4 && i < len(laneStats); i++ { subLanes = append(subLanes, laneStats[i].Lane) }
-
-        // main champs (mix of mastery top and match usage top, max 6)
-        mainChamps := []string{}
-        champSet := map[string]struct{}{}
-        // top3 mastery names
-        {
-            masteryUrl2 := fmt.Sprintf("https://jp1.api.riotgames.com/lol/champion-mastery/v4/champion-masteries/by-puuid/%s", account.PUUID)
-            req2, _ := http.NewRequestWithContext(ctx, "GET", masteryUrl2, nil)
-            req2.Header.Set("X-Riot-Token", apiKey)
-            resp2, err := doRequestWithRetry(req2, client, limiter, 3)
-            if err == nil && resp2 != nil && resp2.StatusCode == 200 {
-                var masteries []struct{ ChampionID, ChampionPoints int }
-                if err := json.NewDecoder(resp2.Body).Decode(&masteries); err == nil {
-                    sort.Slice(masteries, func(i, j int) bool { return masteries[i].ChampionPoints > masteries[j].ChampionPoints })
-                    for i := 0; i < len(masteries) && len(mainChamps) < 3; i++ {
-                        name := championIDToName[masteries[i].ChampionID]
-                        if name != "" { if _, ok := champSet[name]; !ok { mainChamps = append(mainChamps, name); champSet[name] = struct{}{} } }
-                    }
-                }
-                resp2.Body.Close()
-            } else if resp2 != nil { resp2.Body.Close() }
         }
-        if len(mainChamps) < 6 {
-            // usage top
-            type cs struct{ ID, Count int }
-            arr := []cs{}
-            for id, cnt := range championCount { arr = append(arr, cs{id, cnt}) }
-            sort.Slice(arr, func(i, j int) bool { return arr[i].Count > arr[j].Count })
-            for i := 0; i < len(arr) && len(mainChamps) < 6; i++ {
-                name := championIDToName[arr[i].ID]
-                if name != "" { if _, ok := champSet[name]; !ok { mainChamps = append(mainChamps, name); champSet[name] = struct{}{} } }
-            }
+    }
+
+    // rank by puuid (current)
+    var currentRankScore int
+    if rankOK {
+        for _, e := range ranks { if e.QueueType == "RANKED_SOLO_5x5" { currentRankScore, _ = rankScore(e.Tier, e.Rank, e.LeaguePoints); break } }
+    }
+
+    // mastery by puuid (top3 sum); sorted once here and reused for champion picks below
+    topMastery := 0
+    if masteryOK {
+        slices.SortFunc(masteries, func(a, b masteryEntry) int { return cmp.Compare(b.ChampionPoints, a.ChampionPoints) })
+        for i := 0; i < 3 && i < len(masteries); i++ { topMastery += masteries[i].ChampionPoints }
+    } else {
+        masteries = nil
+    }
+
+    // lanes
+    type laneStat struct{ Lane string; Count int }
+    laneStats := make([]laneStat, 0, len(lanes))
+    for i, c := range laneCount { if c > 0 { laneStats = append(laneStats, laneStat{lanes[i], c}) } }
+    slices.SortStableFunc(laneStats, func(a, b laneStat) int { return cmp.Compare(b.Count, a.Count) })
+    mainLanes := make([]string, 0, 2)
+    subLanes := make([]string, 0, 2)
+    for i := 0; i < 2 && i < len(laneStats); i++ { mainLanes = append(mainLanes, laneStats[i].Lane) }
+    for i := 2; i < 4 && i < len(laneStats); i++ { subLanes = append(subLanes, laneStats[i].Lane) }
+
+    // main champs (mix of mastery top and match usage top, max 6)
+    mainChamps := make([]string, 0, 6)
+    champSet := map[string]struct{}{}
+    // top3 mastery names
+    for i := 0; i < len(masteries) && len(mainChamps) < 3; i++ {
+        name := championIDToName[masteries[i].ChampionID]
+        if name != "" { if _, ok := champSet[name]; !ok { mainChamps = append(mainChamps, name); champSet[name] = struct{}{} } }
+    }
+    if len(mainChamps) < 6 {
+        // usage top
+        type cs struct{ ID, Count int }
+        arr := make([]cs, 0, len(championCount))
+        for id, cnt := range championCount { arr = append(arr, cs{id, cnt}) }
+        slices.SortFunc(arr, func(a, b cs) int { return cmp.Compare(b.Count, a.Count) })
+        for i := 0; i < len(arr) && len(mainChamps) < 6; i++ {
+            name := championIDToName[arr[i].ID]
+            if name != "" { if _, ok := champSet[name]; !ok { mainChamps = append(mainChamps, name); champSet[name] = struct{}{} } }
         }
+    }
 
-        // Average match rank score across participants of recent matches
-        totalScore, count := 0, 0
-        for puuid := range puuidSet {
+    // Average match rank score across participants of recent matches
+    totalScore, count := 0, 0
+    var mu sync.Mutex
+    for puuid := range puuidSet {
+        wg.Add(1)
+        go func(puuid string) {
+            defer wg.Done()
             rankUrl := fmt.Sprintf("https://jp1.api.riotgames.com/lol/league/v4/entries/by-puuid/%s", puuid)
-            rreq, _ := http.NewRequestWithContext(ctx, "GET", rankUrl, nil)
-            rreq.Header.Set("X-Riot-Token", apiKey)
-            rresp, err := doRequestWithRetry(rreq, client, limiter, 3)
-            if err != nil || rresp == nil || rresp.StatusCode != 200 { if rresp != nil { rresp.Body.Close() }; continue }
-            var rdata []struct{ QueueType, Tier, Rank string; LeaguePoints int }
-            if err := json.NewDecoder(rresp.Body).Decode(&rdata); err == nil {
-                for _, e := range rdata {
-                    if e.QueueType == "RANKED_SOLO_5x5" {
-                        totalScore += rankScore(e.Tier, e.Rank, e.LeaguePoints)
+            var rdata []rankEntry
+            if status, err := rc.getJSON(ctx, rankUrl, &rdata); err != nil || status != 200 { return }
+            for _, e := range rdata {
+                if e.QueueType == "RANKED_SOLO_5x5" {
+                    if score, ok := rankScore(e.Tier, e.Rank, e.LeaguePoints); ok {
+                        mu.Lock()
+                        totalScore += score
                         count++
-                        break
+                        mu.Unlock()
                     }
+                    break
                 }
             }
-            rresp.Body.Close()
+        }(puuid)
+    }
+    wg.Wait()
+    avgRankScore := 0
+    if count > 0 { avgRankScore = totalScore / count }
+
+    skillScore := currentRankScore*2 + avgRankScore + topMastery/1000
+    // lane-specific sub champions (top by usage, then mastery)
+    getLaneChampions := func(lane string) []string {
+        champSet := make(map[string]struct{})
+        result := make([]string, 0, 3)
+        type cs struct{ ID, Count int }
+        arr := make([]cs, 0, len(laneChampCount[lane]))
+        for id, c := range laneChampCount[lane] { arr = append(arr, cs{id, c}) }
+        slices.SortFunc(arr, func(a, b cs) int { return cmp.Compare(b.Count, a.Count) })
+        for i := 0; i < len(arr) && len(result) < 3; i++ {
+            if name := championIDToName[arr[i].ID]; name != "" { if _, ok := champSet[name]; !ok { result = append(result, name); champSet[name] = struct{}{} } }
         }
-        avgRankScore := 0
-        if count > 0 { avgRankScore = totalScore / count }
-
-        skillScore := currentRankScore*2 + avgRankScore + topMastery/1000
-        // lane-specific sub champions (top by usage, then mastery)
-        getLaneChampions := func(lane string) []string {
-            champSet := make(map[string]struct{})
-            result := []string{}
-            type cs struct{ ID, Count int }
-            arr := []cs{}
-            for id, c := range laneChampCount[lane] { arr = append(arr, cs{id, c}) }
-            sort.Slice(arr, func(i, j int) bool { return arr[i].Count > arr[j].Count })
-            for i := 0; i < len(arr) && len(result) < 3; i++ {
-                if name := championIDToName[arr[i].ID]; name != "" { if _, ok := champSet[name]; !ok { result = append(result, name); champSet[name] = struct{}{} } }
-            }
-            if len(result) < 3 && len(masteries) > 0 {
-                sort.Slice(masteries, func(i, j int) bool { return masteries[i].ChampionPoints > masteries[j].ChampionPoints })
-                for i := 0; i < len(masteries) && len(result) < 3; i++ {
-                    if name := championIDToName[masteries[i].ChampionID]; name != "" { if _, ok := champSet[name]; !ok { result = append(result, name); champSet[name] = struct{}{} } }
-                }
+        if len(result) < 3 {
+            for i := 0; i < len(masteries) && len(result) < 3; i++ {
+                if name := championIDToName[masteries[i].ChampionID]; name != "" { if _, ok := champSet[name]; !ok { result = append(result, name); champSet[name] = struct{}{} } }
             }
-            return result
         }
-        mainLaneChamps := map[string][]string{}
-        for _, lane := range mainLanes { mainLaneChamps[lane] = getLaneChampions(lane) }
-        subLaneChamps := map[string][]string{}
-        for _, lane := range subLanes { subLaneChamps[lane] = getLaneChampions(lane) }
-
-        playerData := map[string]interface{}{
-            "name":                  fmt.Sprintf("%s#%s", player.GameName, player.TagLine),
-            "skill_score":           skillScore,
-            "current_rank_score":    currentRankScore,
-            "avg_match_rank_score":  avgRankScore,
-            "main_lanes":            mainLanes,
-            "main_sublanes":         subLanes,
-            "main_champions":        mainChamps,
-            "main_lane_champions":   mainLaneChamps,
-            "sublane_champions":     subLaneChamps,
-            "mastery_top3":          topMastery,
-            "ranked_recent_count":   rankedCount,
-            "ranked_recent_wins":    rankedWin,
-        }
-        allPlayerData = append(allPlayerData, playerData)
+        return result
     }
+    mainLaneChamps := map[string][]string{}
+    for _, lane := range mainLanes { mainLaneChamps[lane] = getLaneChampions(lane) }
+    subLaneChamps := map[string][]string{}
+    for _, lane := range subLanes { subLaneChamps[lane] = getLaneChampions(lane) }
+
+    return &playerSummary{
+        Name:              fmt.Sprintf("%s#%s", player.GameName, player.TagLine),
+        SkillScore:        skillScore,
+        CurrentRankScore:  currentRankScore,
+        AvgMatchRankScore: avgRankScore,
+        MainLanes:         mainLanes,
+        MainSublanes:      subLanes,
+        MainChampions:     mainChamps,
+        MainLaneChampions: mainLaneChamps,
+        SublaneChampions:  subLaneChamps,
+        MasteryTop3:       topMastery,
+        RankedRecentCount: rankedCount,
+        RankedRecentWins:  rankedWin,
+    }, nil
+}
 
-    // team split by alternating after sorting by skill
-    sort.Slice(allPlayerData, func(i, j int) bool { return allPlayerData[i]["skill_score"].(int) > allPlayerData[j]["skill_score"].(int) })
-    teamA := []map[string]interface{}{}
-    teamB := []map[string]interface{}{}
+func analyze(ctx context.Context, apiKey string, players []Player, matchLimit int) (*analyzeResult, error) {
+    if len(players) < 2 {
+        return nil, fmt.Errorf("need at least 2 players")
+    }
+    rc := newRiotClient(apiKey)
+
+    championIDToName := championNames(ctx, rc.client)
+
+    allPlayerData := make([]playerSummary, 0, len(players))
+
+    // players only share the client's semaphore, cache and limiter, so analyze them concurrently.
+    // The first failure cancels the rest (errgroup-style) so a bad lobby does not spend the shared rate budget.
+    pctx, cancel := context.WithCancel(ctx)
+    defer cancel()
+    summaries := make([]*playerSummary, len(players))
+    var firstErr error
+    var failOnce sync.Once
+    var wg sync.WaitGroup
+    for i, player := range players {
+        wg.Add(1)
+        go func(i int, player Player) {
+            defer wg.Done()
+            s, err := rc.analyzePlayer(pctx, player, matchLimit, championIDToName)
+            if err != nil { failOnce.Do(func() { firstErr = err; cancel() }); return }
+            summaries[i] = s
+        }(i, player)
+    }
+    wg.Wait()
+    // client went away: checked first, since players cut short by it report that as their own failure
+    if err := ctx.Err(); err != nil { return nil, err }
+    if firstErr != nil { return nil, firstErr }
+    for _, s := range summaries {
+        if s != nil { allPlayerData = append(allPlayerData, *s) }
+    }
+
+    // team split minimizing the skill difference (sorted first so each team lists its strongest player first)
+    slices.SortFunc(allPlayerData, func(a, b playerSummary) int { return cmp.Compare(b.SkillScore, a.SkillScore) })
+    skills := make([]int, len(allPlayerData)) // skill column; also used by the lane-unique search below
+    for i, p := range allPlayerData { skills[i] = p.SkillScore }
+    inA := balanceTeams(skills)
+    teamA := make([]playerSummary, 0, (len(allPlayerData)+1)/2)
+    teamB := make([]playerSummary, 0, (len(allPlayerData)+1)/2)
     sumA, sumB := 0, 0
     for i, p := range allPlayerData {
-        if i%2 == 0 { teamA = append(teamA, p); sumA += p["skill_score"].(int) } else { teamB = append(teamB, p); sumB += p["skill_score"].(int) }
+        if inA[i] { teamA = append(teamA, p); sumA += skills[i] } else { teamB = append(teamB, p); sumB += skills[i] }
     }
-    result := map[string]interface{}{"teamA": teamA, "teamB": teamB, "sumA": sumA, "sumB": sumB}
+    result := &analyzeResult{TeamA: teamA, TeamB: teamB, SumA: sumA, SumB: sumB}
 
     // lane-unique team split for 10 players (optional parity with CLI)
     if len(allPlayerData) == 10 {
-        indices := []int{0,1,2,3,4,5,6,7,8,9}
+        total := sumA + sumB // every split has the same total, so only teamA's sum is tracked: |sA-sB| = |2*sA-total|
         minDiff := 1<<30
-        var bestA, bestB []int
-        var bestAroles, bestBroles []string
-        playerLanes := make([][]string, 10)
-        for i, p := range allPlayerData { if lanes, ok := p["main_lanes"].([]string); ok { playerLanes[i] = lanes } }
-        var comb func([]int, int, []int)
-        comb = func(arr []int, n int, acc []int) {
-            if len(acc) == 5 {
-                usedA, usedB := map[string]bool{}, map[string]bool{}
-                rolesA, rolesB := make([]string, 5), make([]string, 5)
-                okA, okB := true, true
-                for i, idx := range acc {
-                    found := false
-                    for _, lane := range playerLanes[idx] { if !usedA[lane] { usedA[lane] = true; rolesA[i] = lane; found = true; break } }
-                    if !found { okA = false; break }
-                }
-                bidx := 0
-                if okA {
-                    for _, idx := range arr {
-                        inA := false
-                        for _, a := range acc { if idx == a { inA = true; break } }
-                        if inA { continue }
-                        found := false
-                        for _, lane := range playerLanes[idx] { if !usedB[lane] { usedB[lane] = true; rolesB[bidx] = lane; found = true; break } }
-                        if !found { okB = false; break }
-                        bidx++
-                    }
-                }
-                if okA && okB {
-                    sA, sB := 0, 0
-                    for _, idx := range acc { sA += allPlayerData[idx]["skill_score"].(int) }
-                    for _, idx := range arr {
-                        inA := false
-                        for _, a := range acc { if idx == a { inA = true; break } }
-                        if !inA { sB += allPlayerData[idx]["skill_score"].(int) }
-                    }
-                    d := sA - sB; if d < 0 { d = -d }
-                    if d < minDiff { minDiff = d; bestA = append([]int{}, acc...); bestB = []int{}; for _, idx := range arr { inA := false; for _, a := range acc { if idx == a { inA = true; break } }; if !inA { bestB = append(bestB, idx) } }; bestAroles = append([]string{}, rolesA...); bestBroles = append([]string{}, rolesB...) }
-                }
-                return
+        bestMask := 0
+        var roles, bestRoles [10]int // lane index (into lanes) assigned to each player
+        playerLanes := make([][]int, 10)
+        for i, p := range allPlayerData {
+            playerLanes[i] = make([]int, len(p.MainLanes))
+            for j, lane := range p.MainLanes { playerLanes[i][j] = laneIndex(lane) }
+        }
+        // every 5-of-10 bitmask, bit i set = player i in teamA, rest in teamB.
+        // Player 0 is pinned to teamA so each split (and its mirror) is examined once.
+        for mask := 1<<5 - 1; mask < 1<<10; mask = nextComb(mask) {
+            if mask&1 == 0 { continue }
+            var usedA, usedB uint // lanes taken in each team, bit = lane index
+            sA := 0
+            ok := true
+            for idx := 0; idx < 10; idx++ {
+                used := &usedB
+                if mask>>idx&1 == 1 { used = &usedA; sA += skills[idx] }
+                roles[idx] = -1
+                for _, li := range playerLanes[idx] { if *used&(1<<li) == 0 { *used |= 1 << li; roles[idx] = li; break } }
+                if roles[idx] < 0 { ok = false; break }
             }
-            if n == 0 { return }
-            if len(arr) == 0 { return }
-            comb(arr[1:], n-1, append(acc, arr[0]))
-            comb(arr[1:], n, acc)
+            if !ok { continue }
+            d := 2*sA - total; if d < 0 { d = -d }
+            if d < minDiff { minDiff, bestMask, bestRoles = d, mask, roles }
         }
-        comb(indices, 5, []int{})
-        if len(bestA) == 5 && len(bestB) == 5 {
-            type entry struct { Name string `json:"name"`; Role string `json:"role"`; Skill int `json:"skill"` }
-            outA, outB := []entry{}, []entry{}
-            sumRA, sumRB := 0, 0
-            for i, idx := range bestA { outA = append(outA, entry{ Name: allPlayerData[idx]["name"].(string), Role: bestAroles[i], Skill: allPlayerData[idx]["skill_score"].(int) }); sumRA += allPlayerData[idx]["skill_score"].(int) }
-            for i, idx := range bestB { outB = append(outB, entry{ Name: allPlayerData[idx]["name"].(string), Role: bestBroles[i], Skill: allPlayerData[idx]["skill_score"].(int) }); sumRB += allPlayerData[idx]["skill_score"].(int) }
-            result["lane_unique"] = map[string]interface{}{ "teamA": outA, "teamB": outB, "sumA": sumRA, "sumB": sumRB }
+        if bestMask != 0 {
+            lu := &laneUniqueResult{TeamA: make([]laneSeat, 0, 5), TeamB: make([]laneSeat, 0, 5)}
+            for idx := 0; idx < 10; idx++ {
+                seat := laneSeat{Name: allPlayerData[idx].Name, Role: lanes[bestRoles[idx]], Skill: skills[idx]}
+                if bestMask>>idx&1 == 1 { lu.TeamA = append(lu.TeamA, seat); lu.SumA += seat.Skill } else { lu.TeamB = append(lu.TeamB, seat); lu.SumB += seat.Skill }
+            }
+            result.LaneUnique = lu
         }
     }
     return result, nil
@@ -534,6 +925,17 @@ func main() {
     if err := godotenv.Load(); err != nil {
         _ = godotenv.Load("backend/.env")
     }
+    skipOnLimit = os.Getenv("SKIP") == "true"
+    if dir := os.Getenv("CACHE_DIR"); dir != "" {
+        if err := os.MkdirAll(dir, 0755); err != nil {
+            log.Printf("CACHE_DIR=%s unusable, match details are cached in memory only: %v", dir, err)
+        } else {
+            matchCacheDir = dir
+            go func() {
+                for { pruneMatchCache(); time.Sleep(24 * time.Hour) }
+            }()
+        }
+    }
 
     // Env
     apiKey := os.Getenv("RIOT_API_KEY")
@@ -563,11 +965,16 @@ func main() {
         if err := json.NewDecoder(r.Body).Decode(&req); err != nil { http.Error(w, "invalid json", http.StatusBadRequest); return }
         // freeze current reqID for logs
         rid, _ := r.Context().Value(ctxReqID).(string)
-        if req.MatchLimit > 0 { matchLimit = req.MatchLimit }
-        log.Printf("[req %s] analyze start players=%d matchLimit=%d", rid, len(req.Players), matchLimit)
+        limit := matchLimit // per request; the MATCH_LIMIT default is shared by concurrent handlers
+        if req.MatchLimit > 0 { limit = req.MatchLimit }
+        log.Printf("[req %s] analyze start players=%d matchLimit=%d", rid, len(req.Players), limit)
         ctx := r.Context()
         astart := time.Now()
-        result, err := analyze(ctx, apiKey, req.Players, matchLimit)
+        result, err := analyze(ctx, apiKey, req.Players, limit)
+        if err != nil && ctx.Err() != nil {
+            log.Printf("[req %s] analyze aborted, client gone: %v", rid, err)
+            return
+        }
         if err != nil {
             log.Printf("[req %s] analyze error: %v", rid, err)
             http.Error(w, err.Error(), http.StatusBadRequest); return
@@ -586,17 +993,7 @@ func main() {
         }
         dur := time.Since(astart)
         // attach simple meta for progress/diagnostics
-        if m, ok := result["meta"].(map[string]interface{}); ok {
-            m["duration_ms"] = dur.Milliseconds()
-            m["players"] = len(req.Players)
-            m["match_limit"] = matchLimit
-        } else {
-            result["meta"] = map[string]interface{}{
-                "duration_ms": dur.Milliseconds(),
-                "players": len(req.Players),
-                "match_limit": matchLimit,
-            }
-        }
+        result.Meta = &analyzeMeta{DurationMS: dur.Milliseconds(), Players: len(req.Players), MatchLimit: limit}
         log.Printf("[req %s] analyze done in %s", rid, dur)
         w.Header().Set("Content-Type", "application/json")
         json.NewEncoder(w).Encode(result)
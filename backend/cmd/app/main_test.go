@@ -0,0 +1,121 @@
+package main
+
+import (
+	"math/rand"
+	"testing"
+)
+
+// bruteBalance returns the smallest |sum(teamA) - sum(teamB)| over every teamA of size (n+1)/2.
+func bruteBalance(skills []int) int {
+	n, half := len(skills), (len(skills)+1)/2
+	best := -1
+	for mask := 0; mask < 1<<n; mask++ {
+		size, d := 0, 0
+		for i, s := range skills {
+			if mask>>i&1 == 1 {
+				size++
+				d += s
+			} else {
+				d -= s
+			}
+		}
+		if size != half {
+			continue
+		}
+		if d < 0 {
+			d = -d
+		}
+		if best < 0 || d < best {
+			best = d
+		}
+	}
+	return best
+}
+
+// splitDiff checks that inA picks (n+1)/2 players and returns the resulting skill difference.
+func splitDiff(t *testing.T, skills []int, inA []bool) int {
+	t.Helper()
+	if len(inA) != len(skills) {
+		t.Fatalf("len(inA) = %d, want %d", len(inA), len(skills))
+	}
+	size, d := 0, 0
+	for i, s := range skills {
+		if inA[i] {
+			size++
+			d += s
+		} else {
+			d -= s
+		}
+	}
+	if want := (len(skills) + 1) / 2; size != want {
+		t.Fatalf("teamA has %d players, want %d (skills %v)", size, want, skills)
+	}
+	if d < 0 {
+		d = -d
+	}
+	return d
+}
+
+func TestBalanceTeams(t *testing.T) {
+	cases := [][]int{
+		{5, 5},
+		{0, 0, 0},
+		{1, 2, 3},
+		{7, 7, 7, 7, 7},
+		{100, 1, 1, 1},
+		{-5, 3, 10, 2, 8},
+		{1200, 3400, 2100, 900, 3000, 2500, 1800, 2200, 1500, 2700},
+		{0, 0, 1, 1, 1, 2, 2, 9, 9, 9, 9},
+	}
+	for _, skills := range cases {
+		if got, want := splitDiff(t, skills, balanceTeams(skills)), bruteBalance(skills); got != want {
+			t.Errorf("balanceTeams(%v): diff %d, want %d", skills, got, want)
+		}
+	}
+}
+
+// TestBalanceTeamsRandom compares against brute force for every lobby size up to 12, odd sizes and ties included.
+func TestBalanceTeamsRandom(t *testing.T) {
+	rng := rand.New(rand.NewSource(1))
+	for iter := 0; iter < 3000; iter++ {
+		n := 2 + rng.Intn(11)
+		spread := []int{3, 50, 4000}[rng.Intn(3)] // small spreads give many ties
+		base := rng.Intn(3000)
+		skills := make([]int, n)
+		for i := range skills {
+			skills[i] = base + rng.Intn(spread)
+		}
+		if got, want := splitDiff(t, skills, balanceTeams(skills)), bruteBalance(skills); got != want {
+			t.Fatalf("balanceTeams(%v): diff %d, want %d", skills, got, want)
+		}
+	}
+}
+
+// TestBalanceTeamsScaled covers sums above maxBalanceCells, where skills are scaled down: each player's
+// rounding is off by at most scale/2, so the split may miss the optimum by at most n*scale.
+func TestBalanceTeamsScaled(t *testing.T) {
+	rng := rand.New(rand.NewSource(2))
+	for iter := 0; iter < 50; iter++ {
+		n := 2 + rng.Intn(11)
+		half := (n + 1) / 2
+		skills := make([]int, n)
+		minSkill, total := 0, 0
+		for i := range skills {
+			skills[i] = rng.Intn(maxBalanceCells)
+			if i == 0 || skills[i] < minSkill {
+				minSkill = skills[i]
+			}
+		}
+		for _, s := range skills {
+			total += s - minSkill
+		}
+		scale := 1
+		if maxSum := maxBalanceCells/(half+1) - 1; total > maxSum {
+			scale = (total + maxSum - 1) / maxSum
+		}
+		got, want := splitDiff(t, skills, balanceTeams(skills)), bruteBalance(skills)
+		if got < want || got > want+n*scale {
+			t.Fatalf("balanceTeams(%v): diff %d, want within [%d, %d]", skills, got, want, want+n*scale)
+		}
+	}
+}
@@ -1,12 +1,13 @@
 package main
 
 import (
+	"cmp"
     "encoding/json"
 	"fmt"
 	"log"
 	"net/http"
 	"os"
-	"sort"
+	"slices"
 	"strconv"
 	"strings"
 	"sync"
@@ -28,7 +29,9 @@ var tierToInt = map[string]int{
 	"GRANDMASTER": 9,
 	"CHALLENGER":  10,
 }
-var intToTier = map[int]string{
+
+// 逆変換は添字で引けるよう配列で持つ（0は未使用）
+var intToTier = [...]string{
 	1:  "IRON",
 	2:  "BRONZE",
 	3:  "SILVER",
@@ -46,18 +49,21 @@ var rankToInt = map[string]int{
 	"II":  3,
 	"I":   4,
 }
-var intToRank = map[int]string{
+var intToRank = [...]string{
 	1: "IV",
 	2: "III",
 	3: "II",
 	4: "I",
 }
 
-// Tier/Rank/LPを一意のスコアに変換
-func rankScore(tier, rank string, lp int) int {
-	t := tierToInt[tier]
-	r := rankToInt[rank]
-	return ((t-1)*4+(r-1))*100 + lp
+// Tier/Rank/LPを一意のスコアに変換（未知のTier/Rankならokはfalse）
+func rankScore(tier, rank string, lp int) (score int, ok bool) {
+	t, okT := tierToInt[tier]
+	r, okR := rankToInt[rank]
+	if !okT || !okR {
+		return 0, false
+	}
+	return ((t-1)*4+(r-1))*100 + lp, true
 }
 
 // スコアからTier/Rank/LPに逆変換
@@ -65,9 +71,97 @@ func scoreToRank(score int) (string, string, int) {
 	tierIdx := score/400 + 1
 	rankIdx := (score%400)/100 + 1
 	lp := score % 100
-	tier := intToTier[tierIdx]
-	rank := intToRank[rankIdx]
-	return tier, rank, lp
+	if tierIdx < 1 || tierIdx >= len(intToTier) || rankIdx < 1 || rankIdx >= len(intToRank) {
+		return "", "", lp
+	}
+	return intToTier[tierIdx], intToRank[rankIdx], lp
+}
+
+// teamPosition の値（最後は空文字など不明なレーン用の UNKNOWN）。レーン集計はこの添字の配列で持つ
+var lanes = [...]string{"TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY", "UNKNOWN"}
+
+// teamPosition をレーンの添字に変換
+func laneIndex(pos string) int {
+	for i, l := range lanes[:len(lanes)-1] {
+		if l == pos {
+			return i
+		}
+	}
+	return len(lanes) - 1
+}
+
+// balanceTeams で使う (人数 x スキル合計) テーブルの上限セル数
+const maxBalanceCells = 1 << 22
+
+// スキル合計差が最小になるようにAチーム（(n+1)/2人）を選び、各インデックスがAチームかどうかを返す
+// 全組み合わせを列挙せず、(人数, スキル合計) の部分和DPで求める。人数は固定なので最小値が0になるよう
+// シフトしても定数分しか変わらない。テーブルが大きすぎる場合はスキルを縮小して近似する。
+func balanceTeams(skills []int) []bool {
+	n := len(skills)
+	half := (n + 1) / 2
+	minSkill := 0
+	for i, s := range skills {
+		if i == 0 || s < minSkill {
+			minSkill = s
+		}
+	}
+	total := 0
+	for _, s := range skills {
+		total += s - minSkill
+	}
+	scale := 1
+	if maxSum := maxBalanceCells/(half+1) - 1; total > maxSum {
+		scale = (total + maxSum - 1) / maxSum
+	}
+	w := make([]int, n)
+	total = 0
+	for i, s := range skills {
+		w[i] = (s - minSkill + scale/2) / scale
+		total += w[i]
+	}
+
+	// last[k*width+s] = 人数k・合計sに最初に到達したプレイヤーのインデックス+1（0は未到達）
+	width := total + 1
+	last := make([]int16, (half+1)*width)
+	last[0] = -1
+	for i := 0; i < n; i++ {
+		for k := min(i+1, half); k >= 1; k-- {
+			row, prev := last[k*width:(k+1)*width], last[(k-1)*width:k*width]
+			for s := total; s >= w[i]; s-- {
+				if row[s] == 0 && prev[s-w[i]] != 0 {
+					row[s] = int16(i + 1)
+				}
+			}
+		}
+	}
+	best, bestDiff := 0, -1
+	for s := 0; s <= total; s++ {
+		if last[half*width+s] == 0 {
+			continue
+		}
+		// シフト前の単位に戻す（奇数人数ではチーム人数が異なる）
+		d := (2*s-total)*scale + (2*half-n)*minSkill
+		if d < 0 {
+			d = -d
+		}
+		if bestDiff < 0 || d < bestDiff {
+			best, bestDiff = s, d
+		}
+	}
+	inA := make([]bool, n)
+	for k, s := half, best; k > 0; k-- {
+		i := int(last[k*width+s]) - 1
+		inA[i] = true
+		s -= w[i]
+	}
+	return inA
+}
+
+// 同じ数のビットが立っている次に大きい整数を返す（Gosper's hack）
+func nextComb(x int) int {
+	c := x & -x
+	r := x + c
+	return (((r ^ x) >> 2) / c) | r
 }
 
 type Account struct {
@@ -81,14 +175,61 @@ type Player struct {
 	TagLine  string `json:"tagLine"`
 }
 
+// プレイヤーごとの解析結果（team_result.json の teamA/teamB 要素）
+type PlayerData struct {
+	Name              string              `json:"name"`
+	SkillScore        int                 `json:"skill_score"`
+	CurrentRankScore  int                 `json:"current_rank_score"`
+	AvgMatchRankScore int                 `json:"avg_match_rank_score"`
+	MainLanes         []string            `json:"main_lanes"`
+	MainSublanes      []string            `json:"main_sublanes"`
+	MainLaneChampions map[string][]string `json:"main_lane_champions"`
+	SublaneChampions  map[string][]string `json:"sublane_champions"`
+	MainChampions     []string            `json:"main_champions"`
+	MasteryTop3       int                 `json:"mastery_top3"`
+}
+
+// team_result.json の中身
+type TeamResult struct {
+	TeamA []PlayerData `json:"teamA"`
+	TeamB []PlayerData `json:"teamB"`
+	SumA  int          `json:"sumA"`
+	SumB  int          `json:"sumB"`
+}
+
 // -------- レートリミット/進捗管理 --------
+// 1つのレート窓の送信時刻を保持する固定長リングバッファ
+// （limiter開始からの経過時間で持つため1件8バイト・ポインタなし。[]time.Time のように伸び縮みしない）
+type sendLog struct {
+	at   []time.Duration
+	head int // 最も古い要素
+	n    int
+}
+
+func (l *sendLog) full() bool            { return l.n == len(l.at) }
+func (l *sendLog) oldest() time.Duration { return l.at[l.head] }
+func (l *sendLog) push(t time.Duration)  { l.at[(l.head+l.n)%len(l.at)] = t; l.n++ }
+func (l *sendLog) prune(cutoff time.Duration) {
+	for l.n > 0 && l.at[l.head] < cutoff {
+		l.head = (l.head + 1) % len(l.at)
+		l.n--
+	}
+}
+
 type RiotLimiter struct {
 	mu     sync.Mutex
-	secWin []time.Time
-	twoMin []time.Time
+	start  time.Time
+	secWin sendLog // 20 req / 1s
+	twoMin sendLog // 100 req / 120s
 }
 
-func NewRiotLimiter() *RiotLimiter { return &RiotLimiter{} }
+func NewRiotLimiter() *RiotLimiter {
+	return &RiotLimiter{
+		start:  time.Now(),
+		secWin: sendLog{at: make([]time.Duration, 20)},
+		twoMin: sendLog{at: make([]time.Duration, 100)},
+	}
+}
 
 // Wait blocks until a request is permitted under 20req/s and 100req/120s.
 // Returns total sleep time spent inside the call.
@@ -96,35 +237,29 @@ func (r *RiotLimiter) Wait() time.Duration {
 	var slept time.Duration
 	for {
 		r.mu.Lock()
-		now := time.Now()
+		now := time.Since(r.start)
 		// prune windows
-		cutoff1 := now.Add(-1 * time.Second)
-		for len(r.secWin) > 0 && r.secWin[0].Before(cutoff1) {
-			r.secWin = r.secWin[1:]
-		}
-		cutoff2 := now.Add(-120 * time.Second)
-		for len(r.twoMin) > 0 && r.twoMin[0].Before(cutoff2) {
-			r.twoMin = r.twoMin[1:]
-		}
+		r.secWin.prune(now - 1*time.Second)
+		r.twoMin.prune(now - 120*time.Second)
 		// if allowed now
-		if len(r.secWin) < 20 && len(r.twoMin) < 100 {
+		if !r.secWin.full() && !r.twoMin.full() {
 			// record send time
-			r.secWin = append(r.secWin, now)
-			r.twoMin = append(r.twoMin, now)
+			r.secWin.push(now)
+			r.twoMin.push(now)
 			r.mu.Unlock()
 			return slept
 		}
 		// compute sleep needed to satisfy both limits
 		wait1 := time.Duration(0)
-		if len(r.secWin) >= 20 {
-			w := r.secWin[0].Add(1 * time.Second).Sub(now)
+		if r.secWin.full() {
+			w := r.secWin.oldest() + 1*time.Second - now
 			if w > wait1 {
 				wait1 = w
 			}
 		}
 		wait2 := time.Duration(0)
-		if len(r.twoMin) >= 100 {
-			w := r.twoMin[0].Add(120 * time.Second).Sub(now)
+		if r.twoMin.full() {
+			w := r.twoMin.oldest() + 120*time.Second - now
 			if w > wait2 {
 				wait2 = w
 			}
@@ -228,11 +363,11 @@ func (c *Counters) PrintEstimate(prefix string) {
 		p, cm, pl, at, rt, durStr(el), durStr(wrl), durStr(w429), durStr(eta), note)
 }
 
+// SKIPフラグ（.env 読込後に main で一度だけ設定）
+var skipOnLimit bool
+
 // 改良版リトライ付きAPIリクエスト（429はRetry-Afterに従い無制限リトライ）
 func doRequestWithRetry(req *http.Request, client *http.Client, limiter *RiotLimiter, counters *Counters, maxRetry int) (*http.Response, error) {
-	// SKIPフラグ取得
-	skipOnLimit := os.Getenv("SKIP") == "true"
-
 	backoff := 1 * time.Second
 	var lastStatus int
 	tries := 0
@@ -313,6 +448,7 @@ func doRequestWithRetry(req *http.Request, client *http.Client, limiter *RiotLim
 
 func main() {
 	godotenv.Load()
+	skipOnLimit = os.Getenv("SKIP") == "true"
 	apiKey := os.Getenv("RIOT_API_KEY")
 	if apiKey == "" {
 		log.Fatal("RIOT_API_KEYが設定されていません")
@@ -345,17 +481,44 @@ func main() {
 			matchLimit = n
 		}
 	}
-	approxPerPlayer := 4 + 12*matchLimit // account(1), matchlist(1), matchdetail*2(matchLimit*2), rank(1), mastery(1), participants rank(~matchLimit*10)
+	approxPerPlayer := 4 + 11*matchLimit // account(1), matchlist(1), matchdetail(matchLimit), rank(1), mastery(1), participants rank(~matchLimit*10)
 	fmt.Printf("対象プレイヤー数: %d\n", len(players))
 	fmt.Printf("レート制限: 20 req/s, 100 req/120s (理論最大≒50 req/分)\n")
 	fmt.Printf("MATCH_LIMIT: %d\n", matchLimit)
 	fmt.Printf("1人あたり想定Riotリクエスト(概算): %d 件\n", approxPerPlayer)
 	fmt.Printf("理論最短所要時間(概算): 約 %.1f 分\n", float64(approxPerPlayer*len(players))*1.2/60.0)
 
-	var allPlayerData []map[string]interface{} // AI用データ格納
+	allPlayerData := make([]PlayerData, 0, len(players)) // AI用データ格納
 	// メインgoroutineで進捗を表示するため、処理本体は別goroutineで実行
 	done := make(chan struct{})
 	go func() {
+		// 全リクエストで同じクライアントを使い、接続（keep-alive / HTTP/2）を使い回す
+		client := &http.Client{Timeout: 10 * time.Second}
+
+		// Data DragonからチャンピオンID→名前のマップを取得（バージョン固定なので全プレイヤー共通で1回だけ）
+		championIDToName := make(map[int]string)
+		championDataURL := "https://ddragon.leagueoflegends.com/cdn/15.14.1/data/ja_JP/champion.json"
+		championResp, err := client.Get(championDataURL)
+		if err != nil {
+			log.Printf("チャンピオンデータ取得失敗: %v", err)
+		} else {
+			defer championResp.Body.Close()
+			var champData struct {
+				Data map[string]struct {
+					Key  string `json:"key"`
+					Name string `json:"name"`
+				} `json:"data"`
+			}
+			if err := json.NewDecoder(championResp.Body).Decode(&champData); err != nil {
+				log.Printf("チャンピオンデータデコード失敗: %v", err)
+			} else {
+				for _, v := range champData.Data {
+					// keyはstring型の数字
+					id, _ := strconv.Atoi(v.Key)
+					championIDToName[id] = v.Name
+				}
+			}
+		}
 
 		for _, player := range players {
 			fmt.Printf("\n==== %s#%s のデータ取得開始 ====\n", player.GameName, player.TagLine)
@@ -370,7 +533,6 @@ func main() {
 			}
 			req.Header.Set("X-Riot-Token", apiKey)
 
-			client := &http.Client{}
 			counters.AddPlanned(1) // account by riot-id
 			resp, err := doRequestWithRetry(req, client, limiter, counters, 3)
 			if err != nil {
@@ -425,23 +587,19 @@ func main() {
 				fmt.Printf("%d: %s\n", i+1, id)
 			}
 
-			// 3. 各マッチIDから詳細を取得し、使ったチャンピオンを集計
+			// 3. 各マッチIDから詳細を一度だけ取得し、使ったチャンピオン・レーン・参加者をまとめて集計
 			championCount := make(map[int]int)
-			laneCount := make(map[string]int) // レーン集計用
-			maxMatches := 10                  // デフォルト: 10試合分集計
-			if ml := os.Getenv("MATCH_LIMIT"); ml != "" {
-				if n, err := strconv.Atoi(ml); err == nil && n > 0 {
-					maxMatches = n
-				}
-			}
+			var laneCount [len(lanes)]int                  // レーン集計用（lanes の添字）
+			laneChampCount := make(map[string]map[int]int) // lane -> champId -> count
+			puuidSet := make(map[string]struct{})          // 平均マッチランク用の参加者
+			maxMatches := matchLimit                       // MATCH_LIMIT（デフォルト: 10試合分集計）
 			if len(matchIDs) < maxMatches {
 				maxMatches = len(matchIDs)
 			}
 			// ランク戦回数・勝利数
 			rankedCount := 0
 			rankedWin := 0
-			fmt.Printf("[開始] %s#%s: マッチ詳細(使用チャンプ/レーン) 取得 %d件\n", player.GameName, player.TagLine, maxMatches)
-			// 使うマッチ詳細(1回目)
+			fmt.Printf("[開始] %s#%s: マッチ詳細(使用チャンプ/レーン/参加者) 取得 %d件\n", player.GameName, player.TagLine, maxMatches)
 			counters.AddPlanned(maxMatches)
 			for i := 0; i < maxMatches; i++ {
 				matchID := matchIDs[i]
@@ -481,6 +639,10 @@ func main() {
 					log.Printf("マッチ詳細デコード失敗: %v", err)
 					continue
 				}
+				// 参加者はキュー種別に関係なく平均マッチランクの対象
+				for _, p := range matchDetail.Info.Participants {
+					puuidSet[p.PUUID] = struct{}{}
+				}
 
 				// アリーナ(1700), クイックプレイ(490), ARAM(450)は無視
 				if matchDetail.Info.QueueID == 1700 || matchDetail.Info.QueueID == 490 || matchDetail.Info.QueueID == 450 {
@@ -494,11 +656,13 @@ func main() {
 				for _, p := range matchDetail.Info.Participants {
 					if p.PUUID == account.PUUID {
 						championCount[p.ChampionID]++
-						lane := p.TeamPosition
-						if lane == "" {
-							lane = "UNKNOWN"
+						li := laneIndex(p.TeamPosition)
+						lane := lanes[li]
+						laneCount[li]++
+						if laneChampCount[lane] == nil {
+							laneChampCount[lane] = make(map[int]int)
 						}
-						laneCount[lane]++
+						laneChampCount[lane][p.ChampionID]++
 						// ランク戦判定
 						if matchDetail.Info.QueueID == 420 {
 							rankedCount++
@@ -511,45 +675,19 @@ func main() {
 				// API制限対策（RiotLimiterで吸収）
 			}
 
-			// Data DragonからチャンピオンID→名前のマップを取得
-			championIDToName := make(map[int]string)
-			championDataURL := "https://ddragon.leagueoflegends.com/cdn/15.14.1/data/ja_JP/champion.json"
-			championResp, err := http.Get(championDataURL)
-			if err != nil {
-				log.Printf("チャンピオンデータ取得失敗: %v", err)
-			} else {
-				defer championResp.Body.Close()
-				var champData struct {
-					Data map[string]struct {
-						Key  string `json:"key"`
-						Name string `json:"name"`
-					} `json:"data"`
-				}
-				if err := json.NewDecoder(championResp.Body).Decode(&champData); err != nil {
-					log.Printf("チャンピオンデータデコード失敗: %v", err)
-				} else {
-					for _, v := range champData.Data {
-						// keyはstring型の数字
-						var id int
-						fmt.Sscanf(v.Key, "%d", &id)
-						championIDToName[id] = v.Name
-					}
-				}
-			}
-
 			// 4. チャンピオンIDごとに多い順で出力
 			fmt.Println("\n使ったチャンピオンランキング（多い順）:")
 			type champStat struct {
 				ID    int
 				Count int
 			}
-			var stats []champStat
+			stats := make([]champStat, 0, len(championCount))
 			for id, cnt := range championCount {
 				stats = append(stats, champStat{ID: id, Count: cnt})
 			}
 			// 降順ソート
-			sort.Slice(stats, func(i, j int) bool {
-				return stats[i].Count > stats[j].Count
+			slices.SortFunc(stats, func(a, b champStat) int {
+				return cmp.Compare(b.Count, a.Count)
 			})
 			for _, s := range stats {
 				name := championIDToName[s.ID]
@@ -565,12 +703,15 @@ func main() {
 				Lane  string
 				Count int
 			}
-			var laneStats []laneStat
-			for lane, cnt := range laneCount {
-				laneStats = append(laneStats, laneStat{Lane: lane, Count: cnt})
+			laneStats := make([]laneStat, 0, len(lanes))
+			for i, cnt := range laneCount {
+				if cnt > 0 {
+					laneStats = append(laneStats, laneStat{Lane: lanes[i], Count: cnt})
+				}
 			}
-			sort.Slice(laneStats, func(i, j int) bool {
-				return laneStats[i].Count > laneStats[j].Count
+			// 同数のときは lanes の順
+			slices.SortStableFunc(laneStats, func(a, b laneStat) int {
+				return cmp.Compare(b.Count, a.Count)
 			})
 			for _, s := range laneStats {
 				fmt.Printf("%s: %d回\n", s.Lane, s.Count)
@@ -644,11 +785,12 @@ func main() {
 				log.Fatalf("マスタリーAPIリクエスト失敗: %s", masteryResp.Status)
 			}
 
-			var masteries []struct {
+			type masteryStat struct {
 				ChampionID     int `json:"championId"`
 				ChampionLevel  int `json:"championLevel"`
 				ChampionPoints int `json:"championPoints"`
 			}
+			var masteries []masteryStat
 			if err := json.NewDecoder(masteryResp.Body).Decode(&masteries); err != nil {
 				log.Fatal(err)
 			}
@@ -664,59 +806,6 @@ func main() {
 
 			// --- 平均マッチランク計算 ---
 			fmt.Println("\n直近試合の平均マッチランク計算中...")
-			fmt.Printf("[開始] %s#%s: 参加者収集 %d件\n", player.GameName, player.TagLine, maxMatches)
-			puuidSet := make(map[string]struct{})
-			maxMatches = 10 // デフォルト: 10試合分のみ集計
-			if ml := os.Getenv("MATCH_LIMIT"); ml != "" {
-				if n, err := strconv.Atoi(ml); err == nil && n > 0 {
-					maxMatches = n
-				}
-			}
-			if len(matchIDs) < maxMatches {
-				maxMatches = len(matchIDs)
-			}
-			// 使うマッチ詳細(2回目: 参加者収集)
-			counters.AddPlanned(maxMatches)
-			for i := 0; i < maxMatches; i++ {
-				matchID := matchIDs[i]
-				matchDetailUrl := fmt.Sprintf("https://asia.api.riotgames.com/lol/match/v5/matches/%s", matchID)
-				matchDetailReq, err := http.NewRequest("GET", matchDetailUrl, nil)
-				if err != nil {
-					log.Fatal(err)
-				}
-				matchDetailReq.Header.Set("X-Riot-Token", apiKey)
-
-				matchDetailResp, err := doRequestWithRetry(matchDetailReq, client, limiter, counters, 3)
-				if err != nil {
-					log.Fatalf("マッチ詳細APIリクエスト失敗: %v", err)
-				}
-				if matchDetailResp == nil {
-					continue
-				}
-				defer matchDetailResp.Body.Close()
-
-				if matchDetailResp.StatusCode != 200 {
-					log.Printf("マッチ詳細APIリクエスト失敗: %s", matchDetailResp.Status)
-					continue
-				}
-
-				var matchDetail struct {
-					Info struct {
-						Participants []struct {
-							PUUID string `json:"puuid"`
-						} `json:"participants"`
-					} `json:"info"`
-				}
-				if err := json.NewDecoder(matchDetailResp.Body).Decode(&matchDetail); err != nil {
-					log.Printf("マッチ詳細デコード失敗: %v", err)
-					continue
-				}
-				for _, p := range matchDetail.Info.Participants {
-					puuidSet[p.PUUID] = struct{}{}
-				}
-				// API制限対策（RiotLimiterで吸収）
-			}
-
 			// 全PUUIDのランクを取得
 			var totalScore, count int
 			puuidList := make([]string, 0, len(puuidSet))
@@ -762,9 +851,10 @@ func main() {
 				}
 				for _, entry := range rankData {
 					if entry.QueueType == "RANKED_SOLO_5x5" {
-						score := rankScore(entry.Tier, entry.Rank, entry.LeaguePoints)
-						totalScore += score
-						count++
+						if score, ok := rankScore(entry.Tier, entry.Rank, entry.LeaguePoints); ok {
+							totalScore += score
+							count++
+						}
 						break
 					}
 				}
@@ -790,7 +880,9 @@ func main() {
 			currentRankScore := 0
 			for _, entry := range rankData {
 				if entry.QueueType == "RANKED_SOLO_5x5" {
-					currentRankScore = rankScore(entry.Tier, entry.Rank, entry.LeaguePoints)
+					if score, ok := rankScore(entry.Tier, entry.Rank, entry.LeaguePoints); ok {
+						currentRankScore = score
+					}
 					break
 				}
 			}
@@ -799,11 +891,11 @@ func main() {
 			if count > 0 {
 				avgRankScore = totalScore / count
 			}
-			// 上位3体のマスタリーポイント合計
+			// 上位3体のマスタリーポイント合計（ここで一度だけ降順ソートし、以降のチャンピオン抽出でも使い回す）
 			topMastery := 0
 			if len(masteries) > 0 {
-				sort.Slice(masteries, func(i, j int) bool {
-					return masteries[i].ChampionPoints > masteries[j].ChampionPoints
+				slices.SortFunc(masteries, func(a, b masteryStat) int {
+					return cmp.Compare(b.ChampionPoints, a.ChampionPoints)
 				})
 				for i := 0; i < 3 && i < len(masteries); i++ {
 					topMastery += masteries[i].ChampionPoints
@@ -813,33 +905,21 @@ func main() {
 			skillScore := currentRankScore*2 + avgRankScore + topMastery/1000
 
 			// --- 得意レーン・チャンピオン抽出 ---
-			// レーン
-			mainLanes := []string{}
-			subLanes := []string{}
-			{
-				var laneStats []laneStat
-				for lane, cnt := range laneCount {
-					laneStats = append(laneStats, laneStat{Lane: lane, Count: cnt})
-				}
-				sort.Slice(laneStats, func(i, j int) bool {
-					return laneStats[i].Count > laneStats[j].Count
-				})
-				for i := 0; i < 2 && i < len(laneStats); i++ {
-					mainLanes = append(mainLanes, laneStats[i].Lane)
-				}
-				for i := 2; i < 4 && i < len(laneStats); i++ {
-					subLanes = append(subLanes, laneStats[i].Lane)
-				}
+			// レーン（表示用に集計・ソート済みの laneStats を使う）
+			mainLanes := make([]string, 0, 2)
+			subLanes := make([]string, 0, 2)
+			for i := 0; i < 2 && i < len(laneStats); i++ {
+				mainLanes = append(mainLanes, laneStats[i].Lane)
+			}
+			for i := 2; i < 4 && i < len(laneStats); i++ {
+				subLanes = append(subLanes, laneStats[i].Lane)
 			}
 			// チャンピオン（マスタリー上位3体＋試合使用上位3体の合成、重複除外、最大6体）
-			mainChamps := []string{}
+			mainChamps := make([]string, 0, 6)
 			{
 				champSet := make(map[string]struct{})
 				// マスタリー上位3体
 				if len(masteries) > 0 {
-					sort.Slice(masteries, func(i, j int) bool {
-						return masteries[i].ChampionPoints > masteries[j].ChampionPoints
-					})
 					for i := 0; i < 3 && i < len(masteries); i++ {
 						name := championIDToName[masteries[i].ChampionID]
 						if name == "" {
@@ -854,17 +934,10 @@ func main() {
 						}
 					}
 				}
-				// 試合使用上位3体
+				// 試合使用上位3体（表示用にソート済みの stats を使う）
 				if len(mainChamps) < 6 {
-					var champStats []champStat
-					for id, cnt := range championCount {
-						champStats = append(champStats, champStat{ID: id, Count: cnt})
-					}
-					sort.Slice(champStats, func(i, j int) bool {
-						return champStats[i].Count > champStats[j].Count
-					})
-					for i := 0; i < 3 && i < len(champStats); i++ {
-						name := championIDToName[champStats[i].ID]
+					for i := 0; i < 3 && i < len(stats); i++ {
+						name := championIDToName[stats[i].ID]
 						if name == "" {
 							name = "不明"
 						}
@@ -879,76 +952,17 @@ func main() {
 				}
 			}
 
-			// --- レーンごとのサブチャンピオン抽出 ---
-			fmt.Printf("[開始] %s#%s: レーン別チャンピオン集計 %d件\n", player.GameName, player.TagLine, maxMatches)
-			// レーンごとにそのレーンで使ったチャンピオン回数を集計
-			laneChampCount := make(map[string]map[int]int) // lane -> champId -> count
-			// 使うマッチ詳細(3回目: レーン別チャンプ集計)
-			counters.AddPlanned(maxMatches)
-			for i := 0; i < maxMatches; i++ {
-				matchID := matchIDs[i]
-				matchDetailUrl := fmt.Sprintf("https://asia.api.riotgames.com/lol/match/v5/matches/%s", matchID)
-				matchDetailReq, err := http.NewRequest("GET", matchDetailUrl, nil)
-				if err != nil {
-					continue
-				}
-				matchDetailReq.Header.Set("X-Riot-Token", apiKey)
-				matchDetailResp, err := doRequestWithRetry(matchDetailReq, client, limiter, counters, 3)
-				if err != nil {
-					log.Printf("レーンチャンピオンリクエスト失敗: %v", err)
-					continue
-				}
-				if matchDetailResp == nil {
-					continue
-				}
-				defer matchDetailResp.Body.Close()
-				if matchDetailResp.StatusCode != 200 {
-					continue
-				}
-				var matchDetail struct {
-					Info struct {
-						QueueID      int `json:"queueId"`
-						Participants []struct {
-							PUUID        string `json:"puuid"`
-							ChampionID   int    `json:"championId"`
-							TeamPosition string `json:"teamPosition"`
-						} `json:"participants"`
-					} `json:"info"`
-				}
-				if err := json.NewDecoder(matchDetailResp.Body).Decode(&matchDetail); err != nil {
-					continue
-				}
-				// アリーナ・クイックプレイ・ARAMは無視
-				if matchDetail.Info.QueueID == 1700 || matchDetail.Info.QueueID == 490 || matchDetail.Info.QueueID == 450 {
-					continue
-				}
-				if matchDetail.Info.QueueID != 400 && matchDetail.Info.QueueID != 430 && matchDetail.Info.QueueID != 420 {
-					continue
-				}
-				for _, p := range matchDetail.Info.Participants {
-					if p.PUUID == account.PUUID {
-						lane := p.TeamPosition
-						if lane == "" {
-							lane = "UNKNOWN"
-						}
-						if laneChampCount[lane] == nil {
-							laneChampCount[lane] = make(map[int]int)
-						}
-						laneChampCount[lane][p.ChampionID]++
-					}
-				}
-			}
 			// --- レーンごとのサブチャンピオンリスト作成関数 ---
 			getLaneChampions := func(lane string) []string {
 				champSet := make(map[string]struct{})
-				result := []string{}
+				result := make([]string, 0, 3)
 				// 1. そのレーンでの試合使用上位
-				var champStats []champStat
+				champStats := make([]champStat, 0, len(laneChampCount[lane]))
 				for id, cnt := range laneChampCount[lane] {
 					champStats = append(champStats, champStat{ID: id, Count: cnt})
 				}
-				sort.Slice(champStats, func(i, j int) bool {
-					return champStats[i].Count > champStats[j].Count
+				slices.SortFunc(champStats, func(a, b champStat) int {
+					return cmp.Compare(b.Count, a.Count)
 				})
 				for i := 0; i < 3 && i < len(champStats); i++ {
 					name := championIDToName[champStats[i].ID]
@@ -965,9 +979,6 @@ func main() {
 				}
 				// 2. マスタリー上位
 				if len(result) < 3 {
-					sort.Slice(masteries, func(i, j int) bool {
-						return masteries[i].ChampionPoints > masteries[j].ChampionPoints
-					})
 					for i := 0; i < len(masteries) && len(result) < 3; i++ {
 						name := championIDToName[masteries[i].ChampionID]
 						if name == "" {
@@ -992,17 +1003,17 @@ func main() {
 			}
 
 			// --- AI用データ整形 ---
-			playerData := map[string]interface{}{
-				"name":                 fmt.Sprintf("%s#%s", player.GameName, player.TagLine),
-				"skill_score":          skillScore,
-				"current_rank_score":   currentRankScore,
-				"avg_match_rank_score": avgRankScore,
-				"main_lanes":           mainLanes,
-				"main_sublanes":        subLanes,
-				"main_lane_champions":  mainLaneChamps,
-				"sublane_champions":    subLaneChamps,
-				"main_champions":       mainChamps,
-				"mastery_top3":         topMastery,
+			playerData := PlayerData{
+				Name:              fmt.Sprintf("%s#%s", player.GameName, player.TagLine),
+				SkillScore:        skillScore,
+				CurrentRankScore:  currentRankScore,
+				AvgMatchRankScore: avgRankScore,
+				MainLanes:         mainLanes,
+				MainSublanes:      subLanes,
+				MainLaneChampions: mainLaneChamps,
+				SublaneChampions:  subLaneChamps,
+				MainChampions:     mainChamps,
+				MasteryTop3:       topMastery,
 			}
 			allPlayerData = append(allPlayerData, playerData)
 			fmt.Printf("[完了] %s#%s: 解析完了\n", player.GameName, player.TagLine)
@@ -1027,41 +1038,42 @@ AFTER_ASYNC:
 
 	fmt.Println("\n[開始] チーム分け処理")
 	// --- チーム分けロジック ---
-	var teamResult map[string]interface{}
 	if len(allPlayerData) < 2 {
 		fmt.Println("\nチーム分けには2人以上必要です")
 		return
 	}
-	// スキルスコア高い順にソート
-	sort.Slice(allPlayerData, func(i, j int) bool {
-		return allPlayerData[i]["skill_score"].(int) > allPlayerData[j]["skill_score"].(int)
+	// スキルスコア高い順にソート（各チーム内も高い順に並ぶ）
+	slices.SortFunc(allPlayerData, func(a, b PlayerData) int {
+		return cmp.Compare(b.SkillScore, a.SkillScore)
 	})
-	teamA := []map[string]interface{}{}
-	teamB := []map[string]interface{}{}
+	// スキル合計差が最小になる組み合わせで分ける
+	// skills（スキル列）はレーン被りなしチーム分けでも使い回す
+	skills := make([]int, len(allPlayerData))
+	for i, p := range allPlayerData {
+		skills[i] = p.SkillScore
+	}
+	inA := balanceTeams(skills)
+	teamA := make([]PlayerData, 0, (len(allPlayerData)+1)/2)
+	teamB := make([]PlayerData, 0, (len(allPlayerData)+1)/2)
 	var sumA, sumB int
 	for i, p := range allPlayerData {
-		if i%2 == 0 {
+		if inA[i] {
 			teamA = append(teamA, p)
-			sumA += p["skill_score"].(int)
+			sumA += skills[i]
 		} else {
 			teamB = append(teamB, p)
-			sumB += p["skill_score"].(int)
+			sumB += skills[i]
 		}
 	}
-	teamResult = map[string]interface{}{
-		"teamA": teamA,
-		"teamB": teamB,
-		"sumA":  sumA,
-		"sumB":  sumB,
-	}
+	teamResult := TeamResult{TeamA: teamA, TeamB: teamB, SumA: sumA, SumB: sumB}
 	fmt.Println("\n=== チーム分け結果 ===")
 	fmt.Printf("Aチーム（合計スキル: %d）\n", sumA)
 	for _, p := range teamA {
-		fmt.Printf("  %s スキル:%d メインレーン:%v\n", p["name"], p["skill_score"], p["main_lanes"])
+		fmt.Printf("  %s スキル:%d メインレーン:%v\n", p.Name, p.SkillScore, p.MainLanes)
 	}
 	fmt.Printf("Bチーム（合計スキル: %d）\n", sumB)
 	for _, p := range teamB {
-		fmt.Printf("  %s スキル:%d メインレーン:%v\n", p["name"], p["skill_score"], p["main_lanes"])
+		fmt.Printf("  %s スキル:%d メインレーン:%v\n", p.Name, p.SkillScore, p.MainLanes)
 	}
 	// チーム分け結果をJSONファイルに出力
 	jsonResult, err := json.MarshalIndent(teamResult, "", "  ")
@@ -1079,147 +1091,80 @@ AFTER_ASYNC:
 	// --- レーン被りなしチーム分けロジック（5人vs5人専用） ---
 	if len(allPlayerData) == 10 {
 		fmt.Println("\n=== レーン被りなしチーム分け ===")
-		// レーンの種類
+		// レーンの種類は lanes の添字で扱う
 		// 各プレイヤーの得意レーン
-		playerLanes := make([][]string, 10)
+		playerLanes := make([][]int, 10)
 		for i, p := range allPlayerData {
-			mainLanes, _ := p["main_lanes"].([]string)
-			playerLanes[i] = mainLanes
+			playerLanes[i] = make([]int, len(p.MainLanes))
+			for j, lane := range p.MainLanes {
+				playerLanes[i][j] = laneIndex(lane)
+			}
 		}
-		// 0-9のインデックスで5人選ぶ全組み合わせ
-		indices := []int{0, 1, 2, 3, 4, 5, 6, 7, 8, 9}
+		// どの分け方でも合計は同じなので、差は Aチームの合計だけから |2*sumA - total| で求める
+		total := sumA + sumB
 		minDiff := 1 << 30
-		var bestA, bestB []int
-		var bestAroles, bestBroles []string
-		// 全ての5人組み合わせ
-		var comb func([]int, int, []int)
-		comb = func(arr []int, n int, acc []int) {
-			if len(acc) == 5 {
-				// accがAチーム、残りがBチーム
-				usedA := make(map[string]bool)
-				usedB := make(map[string]bool)
-				rolesA := make([]string, 5)
-				rolesB := make([]string, 5)
-				okA, okB := true, true
-				// Aチームのレーン割り当て
-				for i, idx := range acc {
-					found := false
-					for _, lane := range playerLanes[idx] {
-						if !usedA[lane] {
-							usedA[lane] = true
-							rolesA[i] = lane
-							found = true
-							break
-						}
-					}
-					if !found {
-						okA = false
-						break
-					}
+		bestMask := 0
+		var roles, bestRoles [10]int // 各プレイヤーに割り当てたレーン（lanes の添字）
+		// 0-9のインデックスで5人選ぶ全組み合わせをビットマスクで列挙（ビットiが立っていればAチーム、残りがBチーム）
+		// 0番はAチームに固定し、A/Bを入れ替えただけの同じ分け方を二重に調べないようにする
+		for mask := 1<<5 - 1; mask < 1<<10; mask = nextComb(mask) {
+			if mask&1 == 0 {
+				continue
+			}
+			var usedA, usedB uint // 各チームで使用済みのレーン（ビット = lanes の添字）
+			sA := 0
+			ok := true
+			// 各プレイヤーに自チームで未使用の得意レーンを割り当て
+			for idx := 0; idx < 10; idx++ {
+				used := &usedB
+				if mask>>idx&1 == 1 {
+					used = &usedA
+					sA += skills[idx]
 				}
-				// Bチームのレーン割り当て
-				bidx := 0
-				for _, idx := range arr {
-					inA := false
-					for _, a := range acc {
-						if idx == a {
-							inA = true
-							break
-						}
-					}
-					if inA {
-						continue
-					}
-					found := false
-					for _, lane := range playerLanes[idx] {
-						if !usedB[lane] {
-							usedB[lane] = true
-							rolesB[bidx] = lane
-							found = true
-							break
-						}
-					}
-					if !found {
-						okB = false
+				roles[idx] = -1
+				for _, li := range playerLanes[idx] {
+					if *used&(1<<li) == 0 {
+						*used |= 1 << li
+						roles[idx] = li
 						break
 					}
-					bidx++
 				}
-				if okA && okB {
-					// スキルスコア合計
-					sumA, sumB := 0, 0
-					for _, idx := range acc {
-						sumA += allPlayerData[idx]["skill_score"].(int)
-					}
-					for _, idx := range arr {
-						inA := false
-						for _, a := range acc {
-							if idx == a {
-								inA = true
-								break
-							}
-						}
-						if !inA {
-							sumB += allPlayerData[idx]["skill_score"].(int)
-						}
-					}
-					diff := sumA - sumB
-					if diff < 0 {
-						diff = -diff
-					}
-					if diff < minDiff {
-						minDiff = diff
-						bestA = append([]int{}, acc...)
-						bestB = []int{}
-						for _, idx := range arr {
-							inA := false
-							for _, a := range acc {
-								if idx == a {
-									inA = true
-									break
-								}
-							}
-							if !inA {
-								bestB = append(bestB, idx)
-							}
-						}
-						bestAroles = append([]string{}, rolesA...)
-						bestBroles = append([]string{}, rolesB...)
-					}
+				if roles[idx] < 0 {
+					ok = false
+					break
 				}
-				return
 			}
-			if n == 0 {
-				return
+			if !ok {
+				continue
+			}
+			diff := 2*sA - total
+			if diff < 0 {
+				diff = -diff
+			}
+			if diff < minDiff {
+				minDiff = diff
+				bestMask = mask
+				bestRoles = roles
 			}
-        // 配列が空のときはこれ以上選べないので打ち切り
-        if len(arr) == 0 {
-            return
-        }
-        comb(arr[1:], n-1, append(acc, arr[0]))
-        comb(arr[1:], n, acc)
 		}
-		comb(indices, 5, []int{})
-		if len(bestA) == 5 && len(bestB) == 5 {
-			fmt.Printf("Aチーム（合計スキル: %d）\n", func() int {
-				s := 0
-				for _, i := range bestA {
-					s += allPlayerData[i]["skill_score"].(int)
-				}
-				return s
-			}())
-			for i, idx := range bestA {
-				fmt.Printf("  %s スキル:%d レーン:%s\n", allPlayerData[idx]["name"], allPlayerData[idx]["skill_score"], bestAroles[i])
-			}
-			fmt.Printf("Bチーム（合計スキル: %d）\n", func() int {
-				s := 0
-				for _, i := range bestB {
-					s += allPlayerData[i]["skill_score"].(int)
+		if bestMask != 0 {
+			bestA, bestB := make([]int, 0, 5), make([]int, 0, 5)
+			sA := 0
+			for idx := 0; idx < 10; idx++ {
+				if bestMask>>idx&1 == 1 {
+					bestA = append(bestA, idx)
+					sA += skills[idx]
+				} else {
+					bestB = append(bestB, idx)
 				}
-				return s
-			}())
-			for i, idx := range bestB {
-				fmt.Printf("  %s スキル:%d レーン:%s\n", allPlayerData[idx]["name"], allPlayerData[idx]["skill_score"], bestBroles[i])
+			}
+			fmt.Printf("Aチーム（合計スキル: %d）\n", sA)
+			for _, idx := range bestA {
+				fmt.Printf("  %s スキル:%d レーン:%s\n", allPlayerData[idx].Name, skills[idx], lanes[bestRoles[idx]])
+			}
+			fmt.Printf("Bチーム（合計スキル: %d）\n", total-sA)
+			for _, idx := range bestB {
+				fmt.Printf("  %s スキル:%d レーン:%s\n", allPlayerData[idx].Name, skills[idx], lanes[bestRoles[idx]])
 			}
 			return
 		}
@@ -0,0 +1,121 @@
+package main
+
+import (
+	"math/rand"
+	"testing"
+)
+
+// 全組み合わせ（Aチームは (n+1)/2 人）を調べた最小のスキル合計差
+func bruteBalance(skills []int) int {
+	n, half := len(skills), (len(skills)+1)/2
+	best := -1
+	for mask := 0; mask < 1<<n; mask++ {
+		size, d := 0, 0
+		for i, s := range skills {
+			if mask>>i&1 == 1 {
+				size++
+				d += s
+			} else {
+				d -= s
+			}
+		}
+		if size != half {
+			continue
+		}
+		if d < 0 {
+			d = -d
+		}
+		if best < 0 || d < best {
+			best = d
+		}
+	}
+	return best
+}
+
+// inA が (n+1)/2 人を選んでいることを確認し、スキル合計差を返す
+func splitDiff(t *testing.T, skills []int, inA []bool) int {
+	t.Helper()
+	if len(inA) != len(skills) {
+		t.Fatalf("len(inA) = %d, want %d", len(inA), len(skills))
+	}
+	size, d := 0, 0
+	for i, s := range skills {
+		if inA[i] {
+			size++
+			d += s
+		} else {
+			d -= s
+		}
+	}
+	if want := (len(skills) + 1) / 2; size != want {
+		t.Fatalf("teamA has %d players, want %d (skills %v)", size, want, skills)
+	}
+	if d < 0 {
+		d = -d
+	}
+	return d
+}
+
+func TestBalanceTeams(t *testing.T) {
+	cases := [][]int{
+		{5, 5},
+		{0, 0, 0},
+		{1, 2, 3},
+		{7, 7, 7, 7, 7},
+		{100, 1, 1, 1},
+		{-5, 3, 10, 2, 8},
+		{1200, 3400, 2100, 900, 3000, 2500, 1800, 2200, 1500, 2700},
+		{0, 0, 1, 1, 1, 2, 2, 9, 9, 9, 9},
+	}
+	for _, skills := range cases {
+		if got, want := splitDiff(t, skills, balanceTeams(skills)), bruteBalance(skills); got != want {
+			t.Errorf("balanceTeams(%v): diff %d, want %d", skills, got, want)
+		}
+	}
+}
+
+// 12人までの全人数（奇数・同点を含む）で総当たりと比較
+func TestBalanceTeamsRandom(t *testing.T) {
+	rng := rand.New(rand.NewSource(1))
+	for iter := 0; iter < 3000; iter++ {
+		n := 2 + rng.Intn(11)
+		spread := []int{3, 50, 4000}[rng.Intn(3)] // ばらつきが小さいと同点が多くなる
+		base := rng.Intn(3000)
+		skills := make([]int, n)
+		for i := range skills {
+			skills[i] = base + rng.Intn(spread)
+		}
+		if got, want := splitDiff(t, skills, balanceTeams(skills)), bruteBalance(skills); got != want {
+			t.Fatalf("balanceTeams(%v): diff %d, want %d", skills, got, want)
+		}
+	}
+}
+
+// 合計が maxBalanceCells を超えてスキルを縮小する場合: 1人あたりの丸め誤差は scale/2 以下なので、
+// 最適解からのずれは n*scale 以内
+func TestBalanceTeamsScaled(t *testing.T) {
+	rng := rand.New(rand.NewSource(2))
+	for iter := 0; iter < 50; iter++ {
+		n := 2 + rng.Intn(11)
+		half := (n + 1) / 2
+		skills := make([]int, n)
+		minSkill, total := 0, 0
+		for i := range skills {
+			skills[i] = rng.Intn(maxBalanceCells)
+			if i == 0 || skills[i] < minSkill {
+				minSkill = skills[i]
+			}
+		}
+		for _, s := range skills {
+			total += s - minSkill
+		}
+		scale := 1
+		if maxSum := maxBalanceCells/(half+1) - 1; total > maxSum {
+			scale = (total + maxSum - 1) / maxSum
+		}
+		got, want := splitDiff(t, skills, balanceTeams(skills)), bruteBalance(skills)
+		if got < want || got > want+n*scale {
+			t.Fatalf("balanceTeams(%v): diff %d, want within [%d, %d]", skills, got, want, want+n*scale)
+		}
+	}
+}